@@ -1,9 +1,8 @@
+import argparse
 import asyncio
 import os
 import sys
-import aiohttp
 import aiofiles
-import gridfs
 from urllib.parse import urlparse
 from playwright.async_api import async_playwright, BrowserContext
 from pymongo import MongoClient
@@ -11,101 +10,156 @@ import datetime
 import random  # Add this import at the top of your file if not already present
 import time
 from hashlib import md5
+# scraper_common/ sits next to this script in the image and one level up in a checkout
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_common.downloader import get_downloader, close_downloader
+from scraper_common.rate_limiter import get_rate_limiter
+from scraper_common.metrics import get_metrics
+from scraper_common.resource_policy import ResourcePolicy
+from scraper_common.context_pool import ContextPool, POOL_SIZE
+from scraper_common.bulk_writer import BulkUpserter
+from scraper_common.watermarks import Watermark, ensure_indexes
+from scraper_common.session_manager import SessionManager, load_accounts, probe_instagram, INSTAGRAM_AUTH_COOKIES
+from scraper_common.media_store import MediaStore
+from scraper_common.media_queue import MediaFanout
 
 
 #client = MongoClient('mongodb://mongo:27017')
 client = MongoClient('mongodb://localhost:27017')
 db = client['instagram_scraper']  # or whatever your DB name is
-fs = gridfs.GridFS(db)
+media_store = MediaStore('instagram_scraper')
+rate_limiter = get_rate_limiter()
+metrics = get_metrics()
 
 async def download_image_to_mongodb(image_url, post_id, username):
     try:
-        # Fetch the image using aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.get(image_url) as response:
-                if response.status == 200:
-                    # Read the image content as bytes
-                    img_data = await response.read()
-
-                    # Save the image to GridFS with additional metadata
-                    img_name = f"{username}_{post_id}_{image_url.split('/')[-1]}"
-                    file_id = fs.put(
-                        img_data,
-                        filename=img_name,
-                        post_id=post_id,            # Save the post ID
-                        target=username,            # Save the username as target
-                        platform="Instagram"        # Hardcode platform to "Instagram"
-                    )
-                    print(f"Image saved to MongoDB with file_id: {file_id}")
-                else:
-                    print(f"Failed to download {image_url} (Status: {response.status})")
+        # Known URLs only need a reference to the stored blob
+        if await media_store.link_known_url(image_url, post_id=post_id, target=username, platform="Instagram"):
+            print(f"Image already stored, skipped download: {image_url[:60]}...")
+            return True
+
+        # Stream the image into GridFS (once per content hash) in chunks over the shared pooled session
+        img_name = f"{username}_{post_id}_{image_url.split('/')[-1]}"
+        with metrics.stage('download', username):
+            file_id = await media_store.download_deduplicated(
+                image_url,
+                filename=img_name,
+                post_id=post_id,            # Save the post ID
+                target=username,            # Save the username as target
+                platform="Instagram"        # Hardcode platform to "Instagram"
+            )
+        print(f"Image saved to MongoDB with file_id: {file_id}")
+        return True
     except Exception as e:
         print(f"Error downloading image {image_url}: {str(e)}")
+        # Reported to MediaFanout as a failure, direct callers keep scraping
+        return False
 
 
 
 STORAGE_FILE = "instagram_session.json"
+PROFILE_LINKS = [
+    "https://www.instagram.com/cristiano/",
+    "https://www.instagram.com/kingjames/",
+    "https://www.instagram.com/neymarjr/",
+    "https://www.instagram.com/therock/",
+    "https://www.instagram.com/selenagomez/",
+    "https://www.instagram.com/kyliejenner/",
+    "https://www.instagram.com/taylorswift/",
+    "https://www.instagram.com/justinbieber/",
+    "https://www.instagram.com/arianagrande/",
+    "https://www.instagram.com/dualipa/",
+    "https://www.instagram.com/iamcardib/"
+]
 
+# Saved session reused while its cookies are unexpired, re-probed with one API call after the TTL
+session_manager = SessionManager(
+    'instagram',
+    load_accounts(os.environ.get("INSTAGRAM_ACCOUNTS_FILE", "instagram_accounts.json"),
+                  os.environ.get("INSTAGRAM_USERNAME", "insta.25.scra"),
+                  os.environ.get("INSTAGRAM_PASSWORD", "hello@WORLD@2025"),
+                  STORAGE_FILE),
+    login=lambda browser, account, policy: login_to_instagram(account.username, account.password, browser,
+                                                              policy=policy, storage_file=account.session_file),
+    session_format='storage_state',
+    auth_cookies=INSTAGRAM_AUTH_COOKIES,
+    probe=probe_instagram
+)
 
-async def login_to_instagram(username: str, password: str, browser, context=None) -> BrowserContext:
-    if os.path.exists(STORAGE_FILE):
-        print("Loading saved session...")
-        context = await browser.new_context(storage_state=STORAGE_FILE)
-    else:
-        context = await browser.new_context()
-        page = await context.new_page()
-        
-        # Go to Instagram login page
-        await page.goto("https://www.instagram.com/")
-        await page.wait_for_selector("input[name='username']", timeout=10000)
-        await page.fill("input[name='username']", username)
-        await page.fill("input[name='password']", password)
-        await page.click("button[type='submit']")
+# Fonts, analytics and third-party scripts are never needed; story media is kept
+resource_policy = ResourcePolicy(
+    block_types=('font',),
+    first_party_hosts=('instagram.com', 'cdninstagram.com', 'fbcdn.net', 'facebook.com')
+)
 
-        try:
-            # Wait for the page to load after login, or check for the "Save info" button
-            await asyncio.sleep(10)
-            await page.wait_for_selector("button._acan._acap._acas._aj1-._ap30", timeout=1500000)
-            save_info_button = await page.query_selector("button._acan._acap._acas._aj1-._ap30")
-            
-            if save_info_button:
-                print("Clicking on 'Save info' button...")
-                await save_info_button.click()
-                # Add a delay to ensure the session is saved before moving on
-                await page.wait_for_timeout(2000)  # 2-second delay, adjust as necessary
-
-            # Now check if the login was successful (check for a nav bar or some page element)
-            await page.wait_for_selector("nav", timeout=15000)
-            print("Login successful")
-
-            # Save session state after successful login and button click
-            await context.storage_state(path=STORAGE_FILE)
+
+async def login_to_instagram(username: str, password: str, browser, context=None, policy: ResourcePolicy = resource_policy, storage_file: str = STORAGE_FILE) -> BrowserContext:
+    # Full form login; whether a saved session can be reused is decided by session_manager
+    context = await browser.new_context()
+    if policy:
+        await policy.apply(context)
+    page = await context.new_page()
+    
+    # Go to Instagram login page
+    await page.goto("https://www.instagram.com/")
+    await page.wait_for_selector("input[name='username']", timeout=10000)
+    await page.fill("input[name='username']", username)
+    await page.fill("input[name='password']", password)
+    await page.click("button[type='submit']")
+
+    try:
+        # Wait for the page to load after login, or check for the "Save info" button
+        await asyncio.sleep(10)
+        await page.wait_for_selector("button._acan._acap._acas._aj1-._ap30", timeout=1500000)
+        save_info_button = await page.query_selector("button._acan._acap._acas._aj1-._ap30")
         
-        except Exception as e:
-            print("Login failed:", e)
-            return None
+        if save_info_button:
+            print("Clicking on 'Save info' button...")
+            await save_info_button.click()
+            # Add a delay to ensure the session is saved before moving on
+            await page.wait_for_timeout(2000)  # 2-second delay, adjust as necessary
+
+        # Now check if the login was successful (check for a nav bar or some page element)
+        await page.wait_for_selector("nav", timeout=15000)
+        print("Login successful")
+
+        # Save session state after successful login and button click
+        await context.storage_state(path=storage_file)
+    
+    except Exception as e:
+        print("Login failed:", e)
+        await context.close()
+        return None
     
     return context
 
 
-async def scrape_profile(context: BrowserContext, profile_link: str, post_limit: int = 10):
-    page = await context.new_page()
+async def scrape_profile(context: BrowserContext, profile_link: str, post_limit: int = 10, media_queue: MediaFanout = None, page=None):
+    # A page lent by a ContextPool is reused, otherwise open (and later close) our own
+    owns_page = page is None
+    if owns_page:
+        page = await context.new_page()
     username = urlparse(profile_link).path.strip('/')
 
     collection = db[username]  # Collection name (based on username)
 
-    # Get the latest post_id from the database
-    latest_post = collection.find_one({}, sort=[('datetime', -1)])
-    latest_post_id = latest_post['post_id'] if latest_post else None
+    # Get the latest post_id from the target's watermark
+    ensure_indexes(collection, key='post_id')
+    watermark = Watermark(collection, key='post_id')
+    latest_post_id = watermark.latest()
     print(f"Latest post ID in DB for {username}: {latest_post_id}")
 
     posts_data = []
     scraped_post_count = 0
     skipped_pinned_count = 0  # Counter for skipped pinned posts
+    writer = BulkUpserter(collection, key='post_id', watermark=watermark, target=username)
 
     try:
-        await page.goto(profile_link)
-        await page.wait_for_selector("header", timeout=100000)
+        await rate_limiter.acquire(profile_link)
+        with metrics.stage('goto', username):
+            await page.goto(profile_link)
+        with metrics.stage('selector_wait', username):
+            await page.wait_for_selector("header", timeout=100000)
 
         try:
             await page.wait_for_selector('a[href*="/p/"], a[href*="/reel/"]', timeout=100000)
@@ -150,6 +204,7 @@ async def scrape_profile(context: BrowserContext, profile_link: str, post_limit:
                 # Move to the next post
                 next_button = await page.query_selector('svg[aria-label="Next"]')
                 if next_button:
+                    await rate_limiter.acquire(page.url)
                     await next_button.click()
                     await page.wait_for_selector('div._aear', timeout=15000)
                 else:
@@ -179,28 +234,26 @@ async def scrape_profile(context: BrowserContext, profile_link: str, post_limit:
                 'image_urls': image_urls
             }
 
-            # Save the post to MongoDB
-            collection.update_one(
-                {'post_id': post_id},  # Check for existing post by post_id
-                {'$set': post_data},    # Update the post if it exists or insert it if it doesn't
-                upsert=True             # Insert if the post doesn't exist
-            )
-            print(f"Saved post {post_id} to MongoDB for {username}")
+            # Queue the post for the next bulk upsert to MongoDB
+            writer.upsert(post_data)
 
             posts_data.append(post_data)
             scraped_post_count += 1
             skipped_pinned_count = 0  # Reset pinned counter when a valid post is scraped
 
 
-            # Download images to MongoDB (if any)
-            if image_urls:
-                for img_url in image_urls:
+            # Queue images for the media stage so downloads overlap with navigation
+            for img_url in image_urls:
+                if media_queue:
+                    media_queue.submit(img_url, post_id, username)
+                else:
                     await download_image_to_mongodb(img_url, post_id, username)
 
             retry_count = 0
             while retry_count < 3:
                 next_button = await page.query_selector('svg[aria-label="Next"]')
                 if next_button:
+                    await rate_limiter.acquire(page.url)
                     await next_button.click()
                     await page.wait_for_selector('div._aear', timeout=15000)
                     break
@@ -214,6 +267,13 @@ async def scrape_profile(context: BrowserContext, profile_link: str, post_limit:
     except Exception as e:
         print(f"Error scraping profile {profile_link}: {str(e)}")
     finally:
+        # Flush whatever is still batched for this profile
+        try:
+            writer.flush()
+        except Exception as e:
+            print(f"Error saving posts for {username}: {str(e)}")
+        metrics.count(metrics.posts, username, writer.written)
+
         try:
             # Try to click any close button if present
             close_button = await page.query_selector('svg[aria-label="Close"]')
@@ -223,8 +283,10 @@ async def scrape_profile(context: BrowserContext, profile_link: str, post_limit:
         except:
             pass
         
-        # Always close the page
-        await page.close()
+        resource_policy.report(page, username)
+        # Always close a page we opened
+        if owns_page:
+            await page.close()
 
 
 async def download_story_media(url, username, story_id):
@@ -250,24 +312,22 @@ async def download_story_media(url, username, story_id):
     file_path = f"story_media/{username}/{story_id}.{file_ext}"
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    async with aiofiles.open(file_path, 'wb') as f:
-                        await f.write(await response.read())
-                    print(f"Downloaded media to {file_path}")
-                    return file_path
-                else:
-                    print(f"Failed to download media: HTTP {response.status}")
-                    return None
+        # Streamed to disk in chunks, resumed with Range if the connection drops
+        async with aiofiles.open(file_path, 'wb') as f:
+            await get_downloader().stream(url, f)
+        print(f"Downloaded media to {file_path}")
+        return file_path
     except Exception as e:
         print(f"Error downloading media: {str(e)}")
+        if os.path.exists(file_path):
+            os.remove(file_path)
         return None
 
 # Modify your scrape_stories function to return status information along with data
 async def scrape_stories(context: BrowserContext, username: str, start_from: int = 1):
     page = await context.new_page()
     collection = db[f"{username}_stories"]
+    writer = BulkUpserter(collection, key='story_id', target=username)
     
     # Network request tracking setup
     network_urls = []
@@ -283,7 +343,8 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
                     'url': url,
                     'type': 'video' if any(v in url for v in ['.mp4', '/mp4']) else 'image'
                 })
-        await route.continue_()
+        # Fall through to the context's resource policy
+        await route.fallback()
     
     await page.route('**/*', handle_request)
     
@@ -348,6 +409,7 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
         print(f"Navigating to stories for {username}")
         
         # IMPORTANT: Go directly to stories URL
+        await rate_limiter.acquire(f"https://www.instagram.com/stories/{username}/")
         await page.goto(f"https://www.instagram.com/stories/{username}/", wait_until="networkidle", timeout=30000)
         
         # Take debug screenshot to see initial state
@@ -486,7 +548,7 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
                 print(f"🎬 Detected video story - saving and navigating to next")
                 
                 # Save to MongoDB and add to results
-                collection.update_one({'story_id': story_id}, {'$set': story_data}, upsert=True)
+                writer.upsert(story_data)
                 stories_data.append(story_data)
                 
                 # Track video stories to detect being stuck
@@ -523,7 +585,7 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
                                 story_data['media_file_path'] = media_file_path
                 
                 # Save to MongoDB and add to results
-                collection.update_one({'story_id': story_id}, {'$set': story_data}, upsert=True)
+                writer.upsert(story_data)
                 stories_data.append(story_data)
                 
                 # Navigate to next
@@ -532,7 +594,7 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
             else:
                 # Unknown type, just save screenshot and move on
                 story_data['media_extraction_failed'] = True
-                collection.update_one({'story_id': story_id}, {'$set': story_data}, upsert=True)
+                writer.upsert(story_data)
                 stories_data.append(story_data)
                 
                 navigation_success = await navigate_story(page, "unknown", username, story_id)
@@ -586,6 +648,12 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
         }
     
     finally:
+        # Flush batched story documents
+        try:
+            writer.flush()
+        except Exception as e:
+            print(f"Error saving stories for {username}: {e}")
+
         # Clean up
         try:
             print("Cleaning up and exiting story viewer...")
@@ -612,23 +680,51 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
         except Exception as e:
             print(f"Error during cleanup: {e}")
         
+        resource_policy.report(page, f"{username} stories")
         await page.close()
         print("Page closed successfully")
 
 
-async def scrape_profiles_concurrently(context: BrowserContext, profile_links: list, post_limit: int = 10, max_tasks: int = 4):
+async def scrape_profiles_concurrently(context: BrowserContext, profile_links: list, post_limit: int = 10, max_tasks: int = 4, pool: ContextPool = None):
     semaphore = asyncio.Semaphore(max_tasks)
 
-    async def scrape_with_limit(profile):
-        async with semaphore:
-            await scrape_profile(context, profile, post_limit)
+    async with MediaFanout(download_image_to_mongodb) as media_queue:
+        async def scrape_with_limit(profile):
+            # With a pool every profile gets its own logged-in context
+            if pool:
+                async with pool.page() as page:
+                    await scrape_profile(page.context, profile, post_limit, media_queue, page=page)
+                return
+            async with semaphore:
+                await scrape_profile(context, profile, post_limit, media_queue)
 
-    tasks = [scrape_with_limit(profile) for profile in profile_links]
-    await asyncio.gather(*tasks)
+        tasks = [scrape_with_limit(profile) for profile in profile_links]
+        await asyncio.gather(*tasks)
 
 
 import os
 
+async def archive_profiles(profile_links: list, post_limit: int = 10, max_tasks: int = POOL_SIZE):
+    """Archive the latest posts of every profile, each on its own logged-in context from a pool"""
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False)
+        account = session_manager.acquire()
+        context = await session_manager.open(browser, account, policy=resource_policy)
+        if context:
+            rate_limiter.account = account.username
+            await context.close()
+            # Every pooled context starts from the session file the login check just verified
+            async with ContextPool(browser, size=max_tasks, storage_state=account.session_file,
+                                   policy=resource_policy) as pool:
+                await scrape_profiles_concurrently(None, profile_links, post_limit, max_tasks, pool=pool)
+        else:
+            print("Login failed, no profiles archived")
+        await close_downloader()
+        media_store.report()
+        media_store.close()
+        await browser.close()
+
+
 async def main():
     if sys.version_info >= (3, 8):
         asyncio.get_event_loop().set_debug(True)
@@ -640,19 +736,7 @@ async def main():
     # export INSTAGRAM_USERNAME=your_username
     # export INSTAGRAM_PASSWORD=your_password
     
-    profile_links = [ 
-                    "https://www.instagram.com/cristiano/",
-                    "https://www.instagram.com/kingjames/",
-                    "https://www.instagram.com/neymarjr/",
-                    "https://www.instagram.com/therock/", 
-                    "https://www.instagram.com/selenagomez/",
-                    "https://www.instagram.com/kyliejenner/",
-                    "https://www.instagram.com/taylorswift/",
-                    "https://www.instagram.com/justinbieber/",
-                    "https://www.instagram.com/arianagrande/",
-                    "https://www.instagram.com/dualipa/",
-                    "https://www.instagram.com/iamcardib/"
-                   ]
+    profile_links = PROFILE_LINKS
 
     # Select a random profile
     random_profile = random.choice(profile_links)
@@ -676,29 +760,12 @@ async def main():
         )
         
         # IMPORTANT: DO NOT create a context here anymore
-        # Let login_to_instagram create or load the context
-        
-        # Get a logged-in context
-        logged_in_context = await login_to_instagram(username, password, browser)
+        # Let the session manager load (cheaply verified) or log in the context
+        account = session_manager.acquire()
+        rate_limiter.account = account.username
+        logged_in_context = await session_manager.open(browser, account, policy=resource_policy)
         
         if logged_in_context:
-            # Verify we're logged in by checking a profile
-            verify_page = await logged_in_context.new_page()
-            await verify_page.goto("https://www.instagram.com/")
-            await verify_page.wait_for_timeout(2000)
-            
-            # Check for login indicators
-            is_logged_in = await verify_page.query_selector('svg[aria-label="Home"]')
-            
-            if not is_logged_in:
-                print("WARNING: Not properly logged in. Cannot proceed with story scraping.")
-                await verify_page.screenshot(path="debug_screenshots/login_verification.png")
-                await verify_page.close()
-                await browser.close()
-                return
-                
-            await verify_page.close()
-            
             max_retry_attempts = 3
             retry_count = 0
             last_story_num = 0  # Track the last story we successfully processed
@@ -756,7 +823,7 @@ async def main():
                                     '--disable-blink-features=AutomationControlled'
                                 ]
                             )
-                            logged_in_context = await login_to_instagram(username, password, browser)
+                            logged_in_context = await session_manager.open(browser, account, policy=resource_policy)
                             await asyncio.sleep(5)  # Give it time to stabilize
                         
                         else:  # Any other status like ERROR or UNKNOWN
@@ -776,6 +843,9 @@ async def main():
             
             print(f"\n{'='*50}\nCompleted story scraping for: {random_username} with {len(all_stories_data)} total stories\n{'='*50}\n")
             
+        await close_downloader()
+        media_store.report()
+        media_store.close()
         await browser.close()
 
 # Add this function to your script near the beginning
@@ -1194,6 +1264,16 @@ async def navigate_story(page, story_type, username, story_id):
         return False
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', action='store_true',
+                        help="archive the posts of every profile in PROFILE_LINKS instead of one profile's stories")
+    parser.add_argument('--tasks', type=int, default=POOL_SIZE, help="pooled contexts scraping profiles at once")
+    parser.add_argument('--posts', type=int, default=10, help="posts per profile with --profiles")
+    args = parser.parse_args()
+
+    asyncio.run(archive_profiles(PROFILE_LINKS, args.posts, args.tasks) if args.profiles else main())
+    # Prometheus text metrics for the cron run, e.g. for node_exporter's textfile collector
+    if os.environ.get("METRICS_FILE"):
+        metrics.write(os.environ["METRICS_FILE"])
 
 
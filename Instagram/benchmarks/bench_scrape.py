@@ -0,0 +1,206 @@
+# Benchmark: the archive profile loop and the story viewer loop, offline.
+# A local server serves the saved fixtures: a profile grid whose posts open
+# in a modal with a Next link (archieve_insta.scrape_profile), and a story
+# viewer that loads the reels JSON and steps through the stories
+# (insta.scrape_stories). Story images come from the same server and are
+# downloaded as in STORY_MEDIA_CAPTURE=download; network capture needs real
+# CDN hostnames and GridFS. Post images are only counted, downloads have
+# their own benchmark. The rate limiter is lifted, but the archive loop's
+# fixed one-second wait per post is kept, it is part of what is measured.
+#
+# Documents go to an in-memory mongomock database by default, or with
+# --db local to a scratch database on mongodb://localhost:27017.
+#
+# Usage: python benchmarks/bench_scrape.py [--posts 10] [--stories 20] [--db mongomock|local] [--top 5]
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import string
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+from playwright.async_api import async_playwright
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(BENCH_DIR, "fixtures")
+sys.path[:0] = [os.path.dirname(BENCH_DIR), os.path.dirname(os.path.dirname(BENCH_DIR))]
+# insta.py creates its output directories on import and the story loop writes
+# screenshots and media next to it: keep all of that out of the source tree
+os.chdir(tempfile.mkdtemp(prefix="instagram_bench_"))
+
+from benchmarks.harness import FixtureServer, PlaywrightCalls, browser_peak_rss, disable_pacing, png_bytes, report
+import archieve_insta
+import insta
+
+USERNAME = "fixture_user"
+BENCH_DB = "instagram_scraper_bench"
+FIRST_STORY_PK = 3400000000000000001
+PINNED_ICON = '<svg aria-label="Pinned post icon" width="16" height="16"><rect width="16" height="16"/></svg>'
+
+
+def load_template(name: str) -> string.Template:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return string.Template(f.read())
+
+
+def post_id(index: int) -> str:
+    return f"Cfx{index:08d}"
+
+
+class CountingQueue:
+    """Stands in for MediaFanout: post images are counted, not downloaded"""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, url, post_id, username):
+        self.submitted += 1
+
+
+def fixture_server(num_posts: int, num_stories: int) -> FixtureServer:
+    server = FixtureServer()
+    image = png_bytes()
+    profile = load_template("instagram_profile.html")
+    post = load_template("instagram_post.html")
+    with open(os.path.join(FIXTURES, "instagram_reels_media.json"), encoding="utf-8") as f:
+        reels = json.load(f)
+
+    def profile_page(modal: str = "") -> str:
+        # The first post is pinned, like most large accounts
+        grid = "\n".join(
+            f'<a href="/p/{post_id(i)}/"><img src="{server_media(server, f"thumb_{i}.jpg")}" alt="Photo by {USERNAME}">'
+            f'{PINNED_ICON if i == 0 else ""}</a>'
+            for i in range(num_posts + 1))
+        return profile.substitute(username=USERNAME, count=num_posts + 1, grid=grid, modal=modal)
+
+    async def profile_handler(request):
+        return web.Response(text=profile_page(), content_type="text/html")
+
+    async def post_handler(request):
+        index = int(request.match_info["post_id"][len("Cfx"):])
+        modal = post.substitute(
+            username=USERNAME,
+            caption=f"Fixture post {index} #benchmark",
+            datetime=f"2024-06-{1 + index % 28:02d}T12:00:00.000Z",
+            date=f"June {1 + index % 28}, 2024",
+            image=server_media(server, f"post_{index}.jpg"),
+            next_id=post_id(index + 1))
+        return web.Response(text=profile_page(modal), content_type="text/html")
+
+    async def story_viewer(request):
+        with open(os.path.join(FIXTURES, "instagram_story_viewer.html"), encoding="utf-8") as f:
+            return web.Response(text=f.read(), content_type="text/html")
+
+    async def reels_media(request):
+        # The fixture's story repeated with fresh media ids, images served locally
+        payload = copy.deepcopy(reels)
+        template = payload["reels_media"][0]["items"][0]
+        items = []
+        for i in range(num_stories):
+            item = copy.deepcopy(template)
+            item["pk"] = str(FIRST_STORY_PK + i)
+            item["id"] = f"{item['pk']}_{payload['reels_media'][0]['id']}"
+            for candidate in item["image_versions2"]["candidates"]:
+                candidate["url"] = server_media(server, f"story_{i}_{candidate['width']}.jpg")
+            items.append(item)
+        payload["reels_media"][0]["items"] = items
+        payload["reels_media"][0]["media_count"] = len(items)
+        return web.json_response(payload)
+
+    async def home(request):
+        return web.Response(text="<!DOCTYPE html><title>Instagram</title><main role=\"main\"></main>",
+                            content_type="text/html")
+
+    async def media(request):
+        return web.Response(body=image, content_type="image/png")
+
+    server.route(f"/{USERNAME}/", profile_handler)
+    server.route("/p/{post_id}/", post_handler)
+    server.route("/stories/{username}/", story_viewer)
+    server.route("/stories/{username}/{media_id}/", story_viewer)
+    server.route("/api/v1/feed/reels_media/", reels_media)
+    server.route("/cdn/{path:.*}", media)
+    server.route("/", home)
+    return server
+
+
+def server_media(server: FixtureServer, name: str) -> str:
+    # Resolved lazily: the port is only known once the server has started
+    return f"http://127.0.0.1:{server.port}/cdn/v/t51.2885-15/{name}"
+
+
+def use_database(kind: str):
+    """Point both scrapers at a fresh scratch database"""
+    if kind == "mongomock":
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient("mongodb://localhost:27017")
+        client.drop_database(BENCH_DB)
+    db = client[BENCH_DB]
+    archieve_insta.db = db
+    insta.db = db
+    insta.collection = db["stories"]
+    return db
+
+
+async def run_profile(browser, server, calls, db, num_posts):
+    context = await browser.new_context()
+    queue = CountingQueue()
+    calls.reset()
+    start = time.perf_counter()
+    await archieve_insta.scrape_profile(context, server.url(f"/{USERNAME}/"), post_limit=num_posts, media_queue=queue)
+    elapsed = time.perf_counter() - start
+    rss = browser_peak_rss()
+    await context.close()
+    return db[USERNAME].count_documents({}), elapsed, rss
+
+
+async def run_stories(browser, server, calls):
+    context = await browser.new_context()
+    calls.reset()
+    start = time.perf_counter()
+    result = await insta.scrape_stories(context, USERNAME)
+    elapsed = time.perf_counter() - start
+    rss = browser_peak_rss()
+    await context.close()
+    if result.get("status") != "SUCCESS":
+        print(f"scrape_stories ended with {result.get('status')}: {result.get('error', '')}")
+    return len(result.get("data", [])), elapsed, rss
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=10)
+    parser.add_argument("--stories", type=int, default=20)
+    parser.add_argument("--db", choices=("mongomock", "local"), default="mongomock")
+    parser.add_argument("--top", type=int, default=0, help="also list the N most frequent Playwright calls")
+    args = parser.parse_args()
+
+    db = use_database(args.db)
+    disable_pacing(insta.rate_limiter)
+    insta.STORY_MEDIA_CAPTURE = "download"
+    server = await fixture_server(args.posts, args.stories).start()
+    insta.INSTAGRAM_URL = server.url("").rstrip("/")
+    print(f"{args.posts} posts and {args.stories} stories from {server.url()}, working directory {os.getcwd()}")
+
+    with PlaywrightCalls() as calls:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            items, elapsed, rss = await run_profile(browser, server, calls, db, args.posts)
+            report("scrape_profile", items, elapsed, calls, rss, args.top)
+            items, elapsed, rss = await run_stories(browser, server, calls)
+            report("scrape_stories", items, elapsed, calls, rss, args.top)
+            await browser.close()
+    await insta.close_downloader()
+    await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+# Debug screenshot levels for the story loop.
+# Every detection and navigation step used to write a full PNG to
+# debug_screenshots/, several per story. The level decides what happens now:
+#   off        - no debug screenshots at all
+#   on-failure - the last few frames stay in memory (cheap JPEGs) and are
+#                only written to disk when a step fails
+#   always     - the old behaviour, every frame written as a PNG
+
+import os
+import time
+from collections import deque
+
+LEVELS = ('off', 'on-failure', 'always')
+RING_SIZE = 8
+JPEG_QUALITY = 50
+
+
+class DebugArtifacts:
+    """Captures debug frames according to the configured level"""
+
+    def __init__(self, level: str = 'on-failure', directory: str = 'debug_screenshots', ring_size: int = RING_SIZE):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown debug artifact level {level!r}, expected one of {LEVELS}")
+        self.level = level
+        self.directory = directory
+        self.frames = deque(maxlen=ring_size)
+        self.written = 0
+
+    def reset(self):
+        self.frames.clear()
+
+    async def capture(self, page, name: str):
+        """Record a frame for this step; returns the file path when it was written to disk"""
+        if self.level == 'off':
+            return None
+        try:
+            if self.level == 'always':
+                path = os.path.join(self.directory, f"{name}.png")
+                await page.screenshot(path=path)
+                self.written += 1
+                return path
+            # Viewport-only JPEG into memory, no disk write unless a failure dumps it
+            self.frames.append((name, await page.screenshot(type='jpeg', quality=JPEG_QUALITY)))
+        except Exception as e:
+            print(f"Debug capture {name} failed: {e}")
+        return None
+
+    async def failure(self, page, reason: str) -> list:
+        """A step failed: write the buffered frames plus the current one to disk"""
+        if self.level == 'off':
+            return []
+        if self.level == 'always':
+            path = await self.capture(page, f"failure_{reason}_{int(time.time())}")
+            return [path] if path else []
+
+        await self.capture(page, f"failure_{reason}")
+        prefix = f"{reason}_{int(time.time())}"
+        paths = []
+        for index, (name, data) in enumerate(self.frames):
+            path = os.path.join(self.directory, f"{prefix}_{index:02d}_{name}.jpg")
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+        self.frames.clear()
+        self.written += len(paths)
+        print(f"📸 Wrote {len(paths)} debug frames for {reason} to {self.directory}/")
+        return paths
@@ -1,21 +1,36 @@
 # Instagram Story Scraper
 # A tool to extract stories from Instagram accounts
 
+import argparse
 import asyncio
 import os
 import re
 import random
 import datetime
 import time
+import statistics
 import sys
+import functools
 import json
 from hashlib import md5
 from urllib.parse import urlparse
 from typing import List, Dict, Any, Optional, Tuple, Union
-import aiohttp
 import aiofiles
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING
+# scraper_common/ sits next to this script in the image and one level up in a checkout
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_common.downloader import get_downloader, close_downloader
+from scraper_common.rate_limiter import get_rate_limiter
+from scraper_common.metrics import get_metrics
+from scraper_common.resource_policy import ResourcePolicy
+from scraper_common.bulk_writer import BulkUpserter
+from scraper_common.shard_runner import run_sharded
+from scraper_common.daemon import ScrapeDaemon, CYCLE_INTERVAL
+from debug_artifacts import DebugArtifacts, LEVELS as DEBUG_LEVELS
+from scraper_common.media_store import MediaStore
+from story_capture import StoryMediaCapture
+from scraper_common.session_manager import Account, SessionManager, load_accounts, probe_instagram, INSTAGRAM_AUTH_COOKIES
 
 # ================= DATABASE CONFIGURATION =================
 # Connect to MongoDB
@@ -24,27 +39,68 @@ db = client["instagram_scraper"]
 collection = db["stories"]
 
 # ================= CONFIGURATION SETTINGS =================
+# Instagram credentials
+INSTAGRAM_USERNAME = os.environ.get("INSTAGRAM_USERNAME", "insta.25.scra")
+INSTAGRAM_PASSWORD = os.environ.get("INSTAGRAM_PASSWORD", "hello@WORLD@2025")
+# Optional JSON list of {"username", "password", "session_file"} to rotate several accounts
+INSTAGRAM_ACCOUNTS_FILE = os.environ.get("INSTAGRAM_ACCOUNTS_FILE", "instagram_accounts.json")
+
+# Debug screenshots: off, on-failure (in-memory ring buffer) or always
+DEBUG_ARTIFACTS = os.environ.get("DEBUG_ARTIFACTS", "on-failure")
+
+# Story media: "network" stores what the viewer already received, "download" re-fetches img.src
+STORY_MEDIA_CAPTURE = os.environ.get("STORY_MEDIA_CAPTURE", "network")
+
+# Story navigation: "signals" waits for the viewer to move, "fixed" replays the old fixed sleeps
+# as a latency baseline. Per-story latency of each target is recorded per mode in
+# STORY_LATENCY_FILE and compared with the last run in the other mode.
+STORY_WAITS = os.environ.get("STORY_WAITS", "signals")
+STORY_LATENCY_FILE = os.environ.get("STORY_LATENCY_FILE", "story_latency.json")
+
+# Prometheus text file written after each run, and a local /metrics port for the daemon
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# Site the story viewer is opened on; the offline benchmarks point it at a local fixture server
+INSTAGRAM_URL = "https://www.instagram.com"
+
+# scrape_stories outcomes that mean the target could not be read, as opposed to having no
+# (more) stories; a daemon cycle where every target ends like this rebuilds the session
+STORY_FAILURE_STATUSES = ("ERROR", "UNKNOWN", "LOGGED_OUT")
+
+# Target usernames to scrape - replace with your targets
+TARGET_USERNAMES = [
+    "arianagrande",
+    "kimkardashian",
+    "cristiano",
+    "kyliejenner",
+    "selenagomez",
+    "therock"
+]
+
 # Create necessary directories
 os.makedirs("story_screenshots", exist_ok=True)
 os.makedirs("story_media", exist_ok=True)
 os.makedirs("debug_screenshots", exist_ok=True)
 os.makedirs("cookies", exist_ok=True)
 
+debug_artifacts = DebugArtifacts(DEBUG_ARTIFACTS)
+media_store = MediaStore('instagram_scraper')
+rate_limiter = get_rate_limiter()
+metrics = get_metrics()
+
 # ================= HELPER FUNCTIONS =================
 async def download_file(url: str, filepath: str) -> bool:
     """Download a file from URL to local path"""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    async with aiofiles.open(filepath, 'wb') as f:
-                        await f.write(await response.read())
-                    return True
-                else:
-                    print(f"Failed to download file: {response.status}")
-                    return False
+        # Streamed to disk in chunks, resumed with Range if the connection drops
+        async with aiofiles.open(filepath, 'wb') as f:
+            await get_downloader().stream(url, f)
+        return True
     except Exception as e:
         print(f"Error downloading file: {e}")
+        if os.path.exists(filepath):
+            os.remove(filepath)
         return False
 
 async def download_story_media(url: str, username: str, story_id: str) -> Optional[str]:
@@ -96,33 +152,19 @@ async def download_story_media(url: str, username: str, story_id: str) -> Option
             'sec-fetch-site': 'same-site',
         }
         
-        # Try multiple times with increasing timeouts
-        for attempt in range(3):
-            try:
-                timeout = aiohttp.ClientTimeout(total=30 * (attempt + 1))  # Increase timeout with each attempt
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    async with session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            content = await response.read()
-                            if len(content) < 100:  # Very small responses are likely errors
-                                print(f"❌ Response too small ({len(content)} bytes), likely an error")
-                                continue
-                                
-                            async with aiofiles.open(file_path, 'wb') as f:
-                                await f.write(content)
-                            print(f"✅ Downloaded {len(content)} bytes to {file_path}")
-                            return file_path
-                        else:
-                            print(f"❌ Failed download attempt {attempt+1}: HTTP {response.status}")
-            except Exception as e:
-                print(f"❌ Download attempt {attempt+1} failed: {e}")
-                await asyncio.sleep(1)  # Brief pause before retry
-                
-        print(f"❌ All download attempts failed for {url[:60]}...")
-        return None
+        # Streamed to disk in chunks; each of the three attempts (with a growing
+        # timeout) resumes with Range from the last byte written
+        with metrics.stage('download', username):
+            async with aiofiles.open(file_path, 'wb') as f:
+                size = await get_downloader().stream(url, f, headers=headers, min_size=100)
+        metrics.count(metrics.media_bytes, username, size)
+        print(f"✅ Downloaded {size} bytes to {file_path}")
+        return file_path
                     
     except Exception as e:
         print(f"❌ Error downloading story media: {e}")
+        if os.path.exists(file_path):
+            os.remove(file_path)
         return None
 
 # Add this function to handle browser cleanup properly
@@ -161,65 +203,75 @@ async def close_browser_properly(browser):
 # ================= INSTAGRAM AUTHENTICATION =================
 STORAGE_FILE = "instagram_session.json"
 
-async def login_to_instagram(username: str, password: str, browser: Browser) -> BrowserContext:
-    """Log in to Instagram using the reliable approach from the original script"""
+# Fonts, analytics and third-party scripts are never needed; story media is kept
+resource_policy = ResourcePolicy(
+    block_types=('font',),
+    first_party_hosts=('instagram.com', 'cdninstagram.com', 'fbcdn.net', 'facebook.com')
+)
+
+async def login_to_instagram(username: str, password: str, browser: Browser, policy: ResourcePolicy = resource_policy, storage_file: str = STORAGE_FILE) -> BrowserContext:
+    """Full form login; whether a saved session can be reused is decided by session_manager"""
     print(f"Starting Instagram login for {username}...")
     
-    # Use storage state if available (more reliable than cookies)
-    if os.path.exists(STORAGE_FILE):
-        print("Loading saved session...")
-        context = await browser.new_context(storage_state=STORAGE_FILE)
-    else:
-        context = await browser.new_context()
-        page = await context.new_page()
-        
-        # Go to Instagram login page
-        await page.goto("https://www.instagram.com/")
-        await page.wait_for_selector("input[name='username']", timeout=10000)
-        await page.fill("input[name='username']", username)
-        await page.fill("input[name='password']", password)
-        await page.click("button[type='submit']")
+    context = await browser.new_context()
+    if policy:
+        await policy.apply(context)
+    page = await context.new_page()
+    
+    # Go to Instagram login page
+    await page.goto("https://www.instagram.com/")
+    await page.wait_for_selector("input[name='username']", timeout=10000)
+    await page.fill("input[name='username']", username)
+    await page.fill("input[name='password']", password)
+    await page.click("button[type='submit']")
 
-        try:
-            # Wait for the page to load after login, or check for the "Save info" button
-            await asyncio.sleep(10)
-            await page.wait_for_selector("button._acan._acap._acas._aj1-._ap30", timeout=15000)
-            save_info_button = await page.query_selector("button._acan._acap._acas._aj1-._ap30")
-            
-            if save_info_button:
-                print("Clicking on 'Save info' button...")
-                await save_info_button.click()
-                # Add a delay to ensure the session is saved before moving on
-                await page.wait_for_timeout(2000)
+    try:
+        # Wait for the page to load after login, or check for the "Save info" button
+        await asyncio.sleep(10)
+        await page.wait_for_selector("button._acan._acap._acas._aj1-._ap30", timeout=15000)
+        save_info_button = await page.query_selector("button._acan._acap._acas._aj1-._ap30")
+        
+        if save_info_button:
+            print("Clicking on 'Save info' button...")
+            await save_info_button.click()
+            # Add a delay to ensure the session is saved before moving on
+            await page.wait_for_timeout(2000)
 
-            # Now check if the login was successful (check for a nav bar or some page element)
-            await page.wait_for_selector("nav", timeout=15000)
-            print("Login successful")
+        # Now check if the login was successful (check for a nav bar or some page element)
+        await page.wait_for_selector("nav", timeout=15000)
+        print("Login successful")
 
-            # Save session state after successful login and button click
-            await context.storage_state(path=STORAGE_FILE)
-        
-        except Exception as e:
-            print("Login failed:", e)
-            await page.screenshot(path="debug_screenshots/login_failed.png")
-            await context.close()
-            raise Exception(f"Login failed: {e}")
+        # Save session state after successful login and button click
+        await context.storage_state(path=storage_file)
     
-    # Verify login with a test page
-    verify_page = await context.new_page()
-    await verify_page.goto("https://www.instagram.com/")
-    await verify_page.wait_for_timeout(2000)
-    
-    # Check for login indicators
-    is_logged_in = await verify_page.query_selector('svg[aria-label="Home"]')
-    if not is_logged_in:
-        print("WARNING: Not properly logged in. Cannot proceed.")
-        await verify_page.screenshot(path="debug_screenshots/login_verification.png")
-        raise Exception("Login verification failed")
-    
-    print("Login verification successful")
-    await verify_page.close()
+    except Exception as e:
+        print("Login failed:", e)
+        await page.screenshot(path="debug_screenshots/login_failed.png")
+        await context.close()
+        raise Exception(f"Login failed: {e}")
     
+    await page.close()
+    return context
+
+# Saved session reused while its cookies are unexpired, re-probed with one API call after the TTL
+session_manager = SessionManager(
+    'instagram',
+    load_accounts(INSTAGRAM_ACCOUNTS_FILE, INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD, STORAGE_FILE),
+    login=lambda browser, account, policy: login_to_instagram(account.username, account.password, browser,
+                                                              policy=policy, storage_file=account.session_file),
+    session_format='storage_state',
+    auth_cookies=INSTAGRAM_AUTH_COOKIES,
+    probe=probe_instagram
+)
+
+async def open_instagram_session(browser: Browser, policy: ResourcePolicy = resource_policy,
+                                 account: Optional[Account] = None) -> BrowserContext:
+    """Logged-in context for the given account, else the least recently used healthy one"""
+    account = account or session_manager.acquire()
+    context = await session_manager.open(browser, account, policy=policy)
+    if not context:
+        raise Exception("Login failed")
+    rate_limiter.account = account.username
     return context
 
 # ================= STORY DETECTION AND NAVIGATION =================
@@ -228,7 +280,7 @@ async def detect_story_type(page: Page) -> str:
     """Detect the type of story being viewed with better accuracy"""
     try:
         # Take a debug screenshot
-        await page.screenshot(path=f"debug_screenshots/story_detect_{int(time.time())}.png")
+        await debug_artifacts.capture(page, f"story_detect_{int(time.time())}")
         
         # Check for video elements with broader selectors
         video_elements = await page.query_selector_all('video, svg[aria-label="Video"], div.x78zum5 > div.x1qjc9v5')
@@ -268,17 +320,18 @@ async def detect_story_type(page: Page) -> str:
             return "image"  # Default to image for better handling
             
         print("⚠️ Could not detect story type - unknown")
+        await debug_artifacts.failure(page, "detect_unknown")
         return "unknown"
     except Exception as e:
         print(f"Error detecting story type: {e}")
+        await debug_artifacts.failure(page, "detect_error")
         return "unknown"
 
 async def check_end_of_stories(page: Page) -> bool:
     """Check if we've reached the end of stories with better detection logic"""
     try:
         # First take a screenshot for debugging
-        debug_path = f"debug_screenshots/end_check_{int(time.time())}.png"
-        await page.screenshot(path=debug_path)
+        await debug_artifacts.capture(page, f"end_check_{int(time.time())}")
         
         # 1. Check for specific end text indicators on the page
         page_text = await page.evaluate('() => document.body.innerText')
@@ -343,17 +396,85 @@ async def check_end_of_stories(page: Page) -> bool:
         
     except Exception as e:
         print(f"❌ Error checking end of stories: {e}")
+        await debug_artifacts.failure(page, "end_check_error")
         return False
 
 
+# Signals that the viewer moved on: the /stories/<user>/<media id>/ URL, the
+# media element's source and the number of filled progress segments
+STORY_MEDIA_SELECTOR = 'section video, img.xl1xv1r, img[data-visualcompletion="media-vc-image"], img[alt*="Photo by"]'
+STORY_PROGRESS_SELECTOR = 'header div[style*="width: 100%"]'
+NAVIGATION_TIMEOUT = 3000  # ms, fallback when no navigation signal arrives
+EDGE_CLICK_TIMEOUT = 500   # ms per edge-click attempt
+
+STORY_POSITION_JS = r"""
+([mediaSelector, progressSelector]) => {
+    const media = document.querySelector(mediaSelector);
+    const match = location.pathname.match(/\/stories\/[^/]+\/(\d+)/);
+    return {
+        url: location.pathname,
+        mediaId: match ? match[1] : null,
+        src: media ? (media.currentSrc || media.src || media.poster || '') : '',
+        progress: document.querySelectorAll(progressSelector).length
+    };
+}
+"""
+
+STORY_CHANGED_JS = """
+([before, mediaSelector, progressSelector]) => {
+    const now = (""" + STORY_POSITION_JS.strip() + """)([mediaSelector, progressSelector]);
+    return now.url !== before.url || now.mediaId !== before.mediaId
+        || (now.src && now.src !== before.src) || now.progress > before.progress;
+}
+"""
+
+STORY_MEDIA_READY_JS = """
+(mediaSelector) => {
+    const media = document.querySelector(mediaSelector);
+    if (!media) return false;
+    if (media.tagName === 'VIDEO') return media.readyState >= 2;
+    return media.complete && media.naturalWidth > 0;
+}
+"""
+
+async def story_position(page: Page) -> Dict[str, Any]:
+    """Snapshot of the current story used to detect that navigation happened"""
+    return await page.evaluate(STORY_POSITION_JS, [STORY_MEDIA_SELECTOR, STORY_PROGRESS_SELECTOR])
+
+async def wait_for_story_change(page: Page, before: Dict[str, Any], timeout: int = NAVIGATION_TIMEOUT,
+                                fixed_wait: int = 1000) -> bool:
+    """Wait until the URL, media or progress bar moves past `before`; False on timeout"""
+    if (STORY_WAITS == "fixed"):
+        # Baseline: sleep what the old code slept after this step and go on with the next method
+        await page.wait_for_timeout(fixed_wait)
+        return False
+    try:
+        await page.wait_for_function(STORY_CHANGED_JS, arg=[before, STORY_MEDIA_SELECTOR, STORY_PROGRESS_SELECTOR],
+                                     timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+async def wait_for_story_media(page: Page, timeout: int = NAVIGATION_TIMEOUT) -> bool:
+    """Wait until the current story's image has decoded or its video has a frame"""
+    try:
+        await page.wait_for_function(STORY_MEDIA_READY_JS, arg=STORY_MEDIA_SELECTOR, timeout=timeout)
+        return True
+    except Exception:
+        return False
+
 async def navigate_to_next_story(page: Page, story_type: str) -> Dict[str, Any]:
-    """Navigate to the next story with improved video handling"""
+    """Navigate to the next story, stopping at the first method that moves the viewer"""
     try:
         print(f"⏭️ Navigating from story type: {story_type}")
         
         # Take before-navigation screenshot for comparison
-        before_path = f"debug_screenshots/before_nav_{int(time.time())}.png"
-        await page.screenshot(path=before_path)
+        await debug_artifacts.capture(page, f"before_nav_{int(time.time())}")
+        before = await story_position(page)
+        moved = False
+        
+        # Each step to the next story loads its media: charge it to the account and host budget
+        await rate_limiter.acquire(page.url)
         
         # For videos, use multiple navigation methods
         if (story_type == "video"):
@@ -367,80 +488,99 @@ async def navigate_to_next_story(page: Page, story_type: str) -> Dict[str, Any]:
                 if (specific_button):
                     print("📌 Found button by specific classes - clicking...")
                     await specific_button.click(force=True)
-                    await page.wait_for_timeout(2000)
+                    moved = await wait_for_story_change(page, before, fixed_wait=2000)
             except Exception as e:
                 print(f"Class-based click failed: {e}")
             
             # Method 2: Try the exact parent element XPath 
-            parent_xpath = '/html/body/div[1]/div/div/div[2]/div/div/div[1]/div[1]/section/div[1]/div/div/div[2]/div[2]/div'
-            print(f"🔍 Trying XPath: {parent_xpath}")
-            
-            await page.evaluate(f'''
-                () => {{
-                    try {{
-                        const nextButtonParent = document.evaluate(
-                            "{parent_xpath}", document, null, 
-                            XPathResult.FIRST_ORDERED_NODE_TYPE, null
-                        ).singleNodeValue;
-                        
-                        if (nextButtonParent) {{
-                            console.log("Found XPath element");
+            if (not moved):
+                parent_xpath = '/html/body/div[1]/div/div/div[2]/div/div/div[1]/div[1]/section/div[1]/div/div/div[2]/div[2]/div'
+                print(f"🔍 Trying XPath: {parent_xpath}")
+                
+                await page.evaluate(f'''
+                    () => {{
+                        try {{
+                            const nextButtonParent = document.evaluate(
+                                "{parent_xpath}", document, null, 
+                                XPathResult.FIRST_ORDERED_NODE_TYPE, null
+                            ).singleNodeValue;
                             
-                            // Try clicking at different levels
-                            [nextButtonParent, 
-                             nextButtonParent.parentElement, 
-                             nextButtonParent.parentElement?.parentElement].forEach(el => {{
-                                if (el) {{
-                                    try {{ 
-                                        console.log("Clicking at level:", el.tagName);
-                                        el.click();
-                                        
-                                        // Dispatch synthetic events
-                                        const rect = el.getBoundingClientRect();
-                                        const centerX = rect.left + rect.width/2;
-                                        const centerY = rect.top + rect.height/2;
-                                        
-                                        [
-                                            new MouseEvent('mousedown', {{bubbles: true, cancelable: true, view: window, clientX: centerX, clientY: centerY}}),
-                                            new MouseEvent('mouseup', {{bubbles: true, cancelable: true, view: window, clientX: centerX, clientY: centerY}}),
-                                            new MouseEvent('click', {{bubbles: true, cancelable: true, view: window, clientX: centerX, clientY: centerY}})
-                                        ].forEach(event => el.dispatchEvent(event));
-                                    }} catch(e) {{}}
-                                }}
-                            }});
+                            if (nextButtonParent) {{
+                                console.log("Found XPath element");
+                                
+                                // Try clicking at different levels
+                                [nextButtonParent, 
+                                 nextButtonParent.parentElement, 
+                                 nextButtonParent.parentElement?.parentElement].forEach(el => {{
+                                    if (el) {{
+                                        try {{ 
+                                            console.log("Clicking at level:", el.tagName);
+                                            el.click();
+                                            
+                                            // Dispatch synthetic events
+                                            const rect = el.getBoundingClientRect();
+                                            const centerX = rect.left + rect.width/2;
+                                            const centerY = rect.top + rect.height/2;
+                                            
+                                            [
+                                                new MouseEvent('mousedown', {{bubbles: true, cancelable: true, view: window, clientX: centerX, clientY: centerY}}),
+                                                new MouseEvent('mouseup', {{bubbles: true, cancelable: true, view: window, clientX: centerX, clientY: centerY}}),
+                                                new MouseEvent('click', {{bubbles: true, cancelable: true, view: window, clientX: centerX, clientY: centerY}})
+                                            ].forEach(event => el.dispatchEvent(event));
+                                        }} catch(e) {{}}
+                                    }}
+                                }});
+                            }}
+                        }} catch(e) {{
+                            console.error("XPath navigation error:", e);
                         }}
-                    }} catch(e) {{
-                        console.error("XPath navigation error:", e);
                     }}
-                }}
-            ''')
-            
-            await page.wait_for_timeout(1500)
+                ''')
+                moved = await wait_for_story_change(page, before, fixed_wait=1500)
             
             # Method 3: Keyboard navigation (most reliable in many cases)
-            print("🔍 Trying keyboard arrow right...")
-            await page.keyboard.press('ArrowRight')
-            await page.wait_for_timeout(1500)
+            if (not moved):
+                print("🔍 Trying keyboard arrow right...")
+                await page.keyboard.press('ArrowRight')
+                moved = await wait_for_story_change(page, before, fixed_wait=1500)
             
             # Method 4: Edge click (good for stories in general)
-            print("🔍 Trying edge screen click...")
-            viewport = await page.evaluate('() => { return {width: window.innerWidth, height: window.innerHeight} }')
-            for y_position in [0.3, 0.5, 0.7]:  # Try multiple vertical positions
-                await page.mouse.click(viewport['width'] * 0.95, viewport['height'] * y_position)
-                await page.wait_for_timeout(500)
+            if (not moved):
+                print("🔍 Trying edge screen click...")
+                viewport = await page.evaluate('() => { return {width: window.innerWidth, height: window.innerHeight} }')
+                for y_position in [0.3, 0.5, 0.7]:  # Try multiple vertical positions
+                    await page.mouse.click(viewport['width'] * 0.95, viewport['height'] * y_position)
+                    if (await wait_for_story_change(page, before, timeout=EDGE_CLICK_TIMEOUT, fixed_wait=500)):
+                        moved = True
+                        break
         else:
             # For non-video stories, use standard navigation
             next_button = await page.query_selector('div.x6s0dn4.x78zum5.xdt5ytf.xl56j7k, svg[aria-label="Next"]')
             if next_button:
                 await next_button.click()
-                await page.wait_for_timeout(1000)
+                moved = await wait_for_story_change(page, before)
             
-            await page.keyboard.press('ArrowRight')
-            await page.wait_for_timeout(1000)
+            if (not moved):
+                await page.keyboard.press('ArrowRight')
+                moved = await wait_for_story_change(page, before)
+        
+        if (STORY_WAITS == "fixed"):
+            # The old code then paused 2 s more after a video before looking at the viewer
+            if (story_type == "video"):
+                await page.wait_for_timeout(2000)
+            moved = await page.evaluate(STORY_CHANGED_JS, [before, STORY_MEDIA_SELECTOR, STORY_PROGRESS_SELECTOR])
+        
+        if (not moved):
+            print("⚠️ No navigation signal before timeout - viewer did not move")
+            await debug_artifacts.failure(page, "navigation_stuck")
+            return {'success': False, 'end_reached': False}
+        
+        # The next story counts as loaded once its media can be captured
+        if (STORY_WAITS != "fixed"):
+            await wait_for_story_media(page)
         
         # Take after-navigation screenshot to verify movement
-        after_path = f"debug_screenshots/after_nav_{int(time.time())}.png"
-        await page.screenshot(path=after_path)
+        await debug_artifacts.capture(page, f"after_nav_{int(time.time())}")
         
         # Do NOT check for end of stories immediately after video navigation
         # Instead, return success and let the main loop handle detection
@@ -450,10 +590,6 @@ async def navigate_to_next_story(page: Page, story_type: str) -> Dict[str, Any]:
         # For non-video stories, check if we've reached the end
         is_end = await check_end_of_stories(page)
         if (is_end):
-            # time.sleep(10000)
-            print("🏁 STOPPING FOR INSPECTION")
-            print("Detected end of stories - pausing for 15 seconds to allow inspection")
-            await page.wait_for_timeout(15000)  # 15 seconds
             print("🏁 Reached end of stories during navigation")
             return {'success': True, 'end_reached': True}
             
@@ -461,9 +597,67 @@ async def navigate_to_next_story(page: Page, story_type: str) -> Dict[str, Any]:
         
     except Exception as e:
         print(f"❌ Navigation error: {e}")
+        await debug_artifacts.failure(page, "navigation_error")
         return {'success': False, 'error': str(e)}
 
 # ================= STORY SCRAPING =================
+# (database, collection) pairs whose story lookup index this process has created
+_story_indexed = set()
+
+def archived_story_ids(username: str) -> set:
+    """Media ids of the user's stories archived within the last day (stories live 24 hours)"""
+    since = (datetime.datetime.now() - datetime.timedelta(days=1)).isoformat()
+    try:
+        # Provisioned once per process, not once per user
+        marker = (collection.database.name, collection.name)
+        if marker not in _story_indexed:
+            collection.create_index([("username", ASCENDING), ("scraped_at", ASCENDING)], name="username_scraped_at")
+            _story_indexed.add(marker)
+        return set(collection.distinct('media_id', {'username': username, 'scraped_at': {'$gte': since},
+                                                    'media_id': {'$ne': None}}))
+    except Exception as e:
+        print(f"Could not look up archived stories for {username}: {e}")
+        return set()
+
+def report_story_latency(username: str, latencies: List[float]):
+    """Print the per-story time from one story to the next being ready, next to the last run in the other mode"""
+    if not latencies:
+        return
+    ordered = sorted(latencies)
+    summary = {
+        'median': round(statistics.median(ordered), 3),
+        'p90': round(ordered[min(int(len(ordered) * 0.9), len(ordered) - 1)], 3),
+        'max': round(ordered[-1], 3),
+        'stories': len(ordered),
+        'recorded_at': datetime.datetime.now().isoformat()
+    }
+    print(f"⏱️ Story latency for {username} ({STORY_WAITS} waits): median {summary['median']:.2f}s, "
+          f"p90 {summary['p90']:.2f}s, max {summary['max']:.2f}s over {summary['stories']} stories")
+
+    recorded = {}
+    try:
+        if os.path.exists(STORY_LATENCY_FILE):
+            with open(STORY_LATENCY_FILE, 'r') as f:
+                recorded = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read {STORY_LATENCY_FILE}: {e}")
+    other = "fixed" if STORY_WAITS == "signals" else "signals"
+    previous = recorded.get(other, {}).get(username)
+    if previous:
+        print(f"⏱️ Compared with {other} waits on {previous['recorded_at'][:10]}: "
+              f"median {previous['median']:.2f}s -> {summary['median']:.2f}s, "
+              f"p90 {previous['p90']:.2f}s -> {summary['p90']:.2f}s")
+
+    recorded.setdefault(STORY_WAITS, {})[username] = summary
+    try:
+        # Atomic replace, sharded workers report concurrently
+        tmp_file = f"{STORY_LATENCY_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(recorded, f, indent=2)
+        os.replace(tmp_file, STORY_LATENCY_FILE)
+    except OSError as e:
+        print(f"Could not record story latency: {e}")
+
 async def scrape_stories(context: BrowserContext, username: str, start_from: int = 1) -> Dict[str, Any]:
     """Scrape Instagram stories for a given username"""
     print(f"Starting story scraping for {username}")
@@ -474,15 +668,35 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
     story_count = start_from - 1  # Start from the specified story
     max_stories = 50  # Maximum stories to scrape
     consecutive_navigation_failures = 0
-    video_story_detection_count = 0
-    last_video_story_id = None
+    same_story_count = 0
+    last_story_id = None
     processed_story_ids = set()
+    writer = BulkUpserter(collection, key='story_id', target=username)
+    archived_ids = archived_story_ids(username)
+    skipped_stories = 0
+    story_latencies = []
+    debug_artifacts.reset()  # frames from the previous target are no help here
+    capture = None
+    if (STORY_MEDIA_CAPTURE == "network"):
+        capture = StoryMediaCapture(page, media_store, username)
+        capture.attach()
     
     try:
         # Navigate to user's stories
         print(f"Navigating to stories for {username}")
-        await page.goto(f"https://www.instagram.com/stories/{username}/", wait_until="domcontentloaded")
-        await page.wait_for_timeout(3000)
+        await rate_limiter.acquire(f"{INSTAGRAM_URL}/stories/{username}/")
+        with metrics.stage('goto', username):
+            await page.goto(f"{INSTAGRAM_URL}/stories/{username}/", wait_until="domcontentloaded")
+        
+        # An expired session is redirected to the login page, which looks like "no stories" below
+        if ("/accounts/login" in page.url):
+            print("Redirected to the login page, the session is logged out")
+            await debug_artifacts.failure(page, f"{username}_logged_out")
+            return {
+                "status": "LOGGED_OUT",
+                "data": [],
+                "message": "Session is logged out"
+            }
         
         # Check if we need to click "View story" button
         view_story_selectors = [
@@ -493,6 +707,16 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
             'div._acan._acap._acas'
         ]
         
+        # Wait for either the "View story" prompt or the story media itself
+        try:
+            with metrics.stage('selector_wait', username):
+                if (STORY_WAITS == "fixed"):
+                    await page.wait_for_timeout(3000)
+                else:
+                    await page.wait_for_selector(', '.join(view_story_selectors + [STORY_MEDIA_SELECTOR]), timeout=5000)
+        except Exception:
+            print("Neither a story prompt nor story media appeared")
+        
         for selector in view_story_selectors:
             try:
                 view_button = await page.query_selector(selector)
@@ -500,7 +724,10 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
                     print(f"Found story prompt with selector: {selector}")
                     print("Clicking 'View story' button for " + username + "...")
                     await view_button.click()
-                    await page.wait_for_timeout(3000)
+                    if (STORY_WAITS == "fixed"):
+                        await page.wait_for_timeout(3000)
+                    else:
+                        await wait_for_story_media(page, timeout=5000)
                     break
             except Exception as e:
                 print(f"Error with selector {selector}: {e}")
@@ -510,6 +737,7 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
         story_indicator = await page.query_selector('div.x5yr21d.x1n2onr6.xh8yej3 img.xl1xv1r')
         if not story_indicator:
             print("Story viewer did not load properly or user has no stories")
+            await debug_artifacts.failure(page, f"{username}_no_viewer")
             return {
                 "status": "NO_STORIES",
                 "data": [],
@@ -519,16 +747,65 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
             print("Proceeding with story extraction for " + username)
         
         # Main story extraction loop
+        story_started = time.monotonic()
         while story_count < max_stories and consecutive_navigation_failures < 3:
+            if (story_count >= start_from):
+                # Time from starting the previous story to being ready on this one
+                story_latencies.append(time.monotonic() - story_started)
+            story_started = time.monotonic()
             story_count += 1
             print(f"Processing story {story_count} for {username}")
             
-            # Generate a unique ID for this story
-            story_id = f"{username}_story_{story_count}"
+            # Key the story by Instagram's media id so reruns map to the same document
+            with metrics.stage('extraction', username):
+                media_id = (await story_position(page)).get('mediaId')
+            story_id = f"{username}_{media_id}" if media_id else f"{username}_story_{story_count}"
+            
+            # Stuck and loop checks come before the skip below, so they also apply while the
+            # viewer sits on (or cycles through) stories that are already archived.
+            # Same story as the previous step: the viewer did not move, mostly a video
+            if (story_id == last_story_id):
+                same_story_count += 1
+                print(f"⚠️ Same story detected {same_story_count} times")
+                
+                # If we're truly stuck, return what we have so far
+                if (same_story_count >= 3):
+                    print("🛑 Stuck on same story - ending gracefully")
+                    await debug_artifacts.failure(page, f"{username}_video_blocker")
+                    return {
+                        "status": "VIDEO_STORY_BLOCKER",
+                        "data": stories_data,
+                        "last_processed_story": story_count
+                    }
+            else:
+                same_story_count = 0
+                last_story_id = story_id
+            
+            # If we've exceeded a reasonable number of stories, assume we're looping
+            if story_count > 30:  # Instagram rarely has more than 30 stories per user
+                print("🛑 Reached maximum reasonable story count (30) - assuming end of stories")
+                print("This likely means we're in a loop - ending extraction")
+                return {
+                    "status": "MAX_STORIES_REACHED",
+                    "data": stories_data,
+                    "last_processed_story": story_count - 1,
+                    "total_stories": len(stories_data)
+                }
             
-            # Skip if we've already processed this story
-            if story_id in processed_story_ids:
-                print(f"Skipping already processed story ID: {story_id}")
+            # Archived on an earlier run (or already seen in this one): one navigation, no capture or download
+            if (story_id in processed_story_ids or media_id in archived_ids):
+                print(f"⏩ Skipping already archived story {story_id}")
+                skipped_stories += 1
+                skip_type = "video" if await page.query_selector('section video') else "image"
+                with metrics.stage('navigate', username):
+                    navigation_result = await navigate_to_next_story(page, skip_type)
+                if (navigation_result.get('end_reached', False)):
+                    print("🏁 End of stories reached - ending extraction")
+                    break
+                if (not navigation_result.get('success', False)):
+                    consecutive_navigation_failures += 1
+                else:
+                    consecutive_navigation_failures = 0
                 continue
                 
             processed_story_ids.add(story_id)
@@ -540,13 +817,15 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
             # Create story data structure
             story_data = {
                 'story_id': story_id,
+                'media_id': media_id,
                 'username': username,
                 'scraped_at': datetime.datetime.now().isoformat(),
                 'screenshot_path': story_screenshot_path
             }
             
             # Detect story type
-            story_type = await detect_story_type(page)
+            with metrics.stage('extraction', username):
+                story_type = await detect_story_type(page)
             story_data['media_type'] = story_type
             
             # Handle story based on its type
@@ -554,55 +833,25 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
                 print(f"🎬 Detected video story {story_count} - Saving screenshot")
                 
                 # Special debug screenshot showing the video state
-                debug_screenshot_path = f"debug_screenshots/{username}_video_{story_count}.png"
-                await page.screenshot(path=debug_screenshot_path)
-                story_data['debug_screenshot'] = debug_screenshot_path
+                debug_screenshot_path = await debug_artifacts.capture(page, f"{username}_video_{story_count}")
+                if (debug_screenshot_path):
+                    story_data['debug_screenshot'] = debug_screenshot_path
                 
-                # For videos, just save screenshot data without trying to extract media
+                # Video bytes are picked up from the network as they stream in and
+                # merged into the story document once complete
                 story_data['is_video'] = True
                 
-                # Save this story data immediately 
-                collection.update_one({'story_id': story_id}, {'$set': story_data}, upsert=True)
+                # Queue this story data for the next bulk write
+                writer.upsert(story_data)
                 stories_data.append(story_data)
                 
-                # Check if we're stuck on the same video
-                if (story_id == last_video_story_id):
-                    video_story_detection_count += 1
-                    print(f"⚠️ Same video detected {video_story_detection_count} times")
-                    
-                    # If we're truly stuck, return what we have so far
-                    if (video_story_detection_count >= 3):
-                        print("🛑 Stuck on same video - ending gracefully")
-                        return {
-                            "status": "VIDEO_STORY_BLOCKER",
-                            "data": stories_data,
-                            "last_processed_story": story_count
-                        }
-                else:
-                    # Reset detection counter for new videos
-                    video_story_detection_count = 0
-                    last_video_story_id = story_id
-                
                 # IMPORTANT: Use more aggressive navigation for videos
                 print("🔄 Using enhanced video story navigation...")
-                navigation_result = await navigate_to_next_story(page, "video")
-                
-                # After video navigation, wait a bit longer and verify we moved
-                await page.wait_for_timeout(2000)
+                with metrics.stage('navigate', username):
+                    navigation_result = await navigate_to_next_story(page, "video")
                 
                 # Take another screenshot to verify movement
-                await page.screenshot(path=f"debug_screenshots/{username}_after_video_{story_count}.png")
-                
-                # Add safety check - if we've exceeded a reasonable number of stories, assume we're looping
-                if story_count >= 30:  # Instagram rarely has more than 30 stories per user
-                    print("🛑 Reached maximum reasonable story count (30) - assuming end of stories")
-                    print("This likely means we're in a loop - ending extraction")
-                    return {
-                        "status": "MAX_STORIES_REACHED",
-                        "data": stories_data,
-                        "last_processed_story": story_count,
-                        "total_stories": len(stories_data)
-                    }
+                await debug_artifacts.capture(page, f"{username}_after_video_{story_count}")
                 
                 # Continue to next story without further processing this one
                 continue
@@ -610,21 +859,29 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
             elif (story_type == "image"):
                 print(f"🖼️ Processing IMAGE story {story_count}")
                 
-                # Try selector from example provided in your message (most specific)
-                specific_image = await page.query_selector('img.xl1xv1r.x168nmei.x13lgxp2[alt*="Photo by"]')
+                # Network capture already stored the bytes the viewer loaded
+                if (capture):
+                    captured = await capture.media_for(story_data['media_id'], 'image')
+                    if (captured):
+                        story_data['media_url'] = captured['image_url']
+                        story_data['media_file_id'] = captured['image_file_id']
                 
-                if (specific_image):
-                    print("✅ Found exact image element from your example")
-                    media_url = await specific_image.get_attribute('src')
-                    if (media_url):
-                        print(f"✅ Got image URL: {media_url[:60]}...")
-                        story_data['media_url'] = media_url
+                if (not story_data.get('media_url')):
+                    # Try selector from example provided in your message (most specific)
+                    specific_image = await page.query_selector('img.xl1xv1r.x168nmei.x13lgxp2[alt*="Photo by"]')
+                
+                    if (specific_image):
+                        print("✅ Found exact image element from your example")
+                        media_url = await specific_image.get_attribute('src')
+                        if (media_url):
+                            print(f"✅ Got image URL: {media_url[:60]}...")
+                            story_data['media_url'] = media_url
                         
-                        # Download image
-                        media_file_path = await download_story_media(media_url, username, story_id)
-                        if (media_file_path):
-                            story_data['media_file_path'] = media_file_path
-                            print(f"✅ Downloaded media to {media_file_path}")
+                            # Download image
+                            media_file_path = await download_story_media(media_url, username, story_id)
+                            if (media_file_path):
+                                story_data['media_file_path'] = media_file_path
+                                print(f"✅ Downloaded media to {media_file_path}")
                 
                 # If that fails, try any images with "Photo by" in alt text
                 if (not story_data.get('media_url')):
@@ -654,16 +911,17 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
                     print(f"✅ Saved screenshot to {screenshot_path}")
                 
                 # Save to MongoDB and add to results
-                collection.update_one({'story_id': story_id}, {'$set': story_data}, upsert=True)
+                writer.upsert(story_data)
                 stories_data.append(story_data)
             else:
                 # Unknown type, just save screenshot and move on
                 story_data['media_type'] = 'unknown'
-                collection.update_one({'story_id': story_id}, {'$set': story_data}, upsert=True)
+                writer.upsert(story_data)
                 stories_data.append(story_data)
             
             # Navigate to next story
-            navigation_result = await navigate_to_next_story(page, story_type)
+            with metrics.stage('navigate', username):
+                navigation_result = await navigate_to_next_story(page, story_type)
             
             # Handle navigation result
             if (navigation_result.get('end_reached', False)):
@@ -691,6 +949,8 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
         
     except Exception as e:
         print(f"Error scraping stories for {username}: {str(e)}")
+        metrics.error('stories', username)
+        await debug_artifacts.failure(page, f"{username}_error")
         return {
             "status": "ERROR", 
             "error": str(e),
@@ -698,6 +958,28 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
         }
         
     finally:
+        report_story_latency(username, story_latencies)
+        metrics.count(metrics.stories, username, len(stories_data))
+        if (skipped_stories):
+            print(f"⏩ Skipped {skipped_stories} stories already archived for {username}")
+
+        # Merge media that finished arriving after its story was processed (mostly video)
+        if (capture):
+            capture.detach()
+            try:
+                captured = await capture.finish()
+                for story in stories_data:
+                    if (captured.get(story.get('media_id'))):
+                        writer.upsert({'story_id': story['story_id'], **captured[story['media_id']]})
+            except Exception as e:
+                print(f"Error merging captured media for {username}: {e}")
+
+        # Flush batched story documents
+        try:
+            writer.flush()
+        except Exception as e:
+            print(f"Error saving stories for {username}: {e}")
+
         # Clean up
         try:
             print("Cleaning up and exiting story viewer...")
@@ -713,18 +995,19 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
                     if close_button:
                         print(f"Found close button with selector: {selector}")
                         await close_button.click()
-                        await page.wait_for_timeout(2000)
                         break
                 except Exception as close_error:
                     print(f"Error with close button {selector}: {close_error}")
             
             # Navigate to main page to ensure we're out of stories mode
             try:
-                await page.goto("https://www.instagram.com/", timeout=10000)
+                await page.goto(f"{INSTAGRAM_URL}/", timeout=10000)
                 print("Navigated to Instagram home page to ensure clean exit")
             except Exception as nav_error:
                 print(f"Error during cleanup navigation: {nav_error}")
             
+            resource_policy.report(page, f"{username} stories")
+
             # Close the page properly
             try:
                 await page.close()
@@ -736,106 +1019,231 @@ async def scrape_stories(context: BrowserContext, username: str, start_from: int
             print(f"Error during cleanup: {e}")
 
 # ================= MAIN EXECUTION =================
-async def main():
-    # Your existing code...
-    browser = None
+async def scrape_target_stories(context: BrowserContext, target_username: str) -> Dict[str, Any]:
+    """Scrape one target's stories, retrying from the last story after a video blocker"""
+    max_retry_attempts = 3
+    retry_count = 0
+    last_story_num = 0
+    all_stories_data = []
+    status = "UNKNOWN"
     
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            
-            # Your existing login and scraping code...
-            # Instagram credentials
-            username = "insta.25.scra"
-            password = "hello@WORLD@2025"
-            
-            # Target usernames to scrape - replace with your targets
-            target_usernames = [
-                "arianagrande",
-                "kimkardashian",
-                "cristiano",
-                "kyliejenner",
-                "selenagomez",
-                "therock"
-            ]
+    print(f"\n{'='*50}\nStarting story scraping for: {target_username}\n{'='*50}\n")
+    
+    while retry_count < max_retry_attempts:
+        try:
+            # Start from the story after the last one we processed
+            start_from = last_story_num + 1
             
-            # Login to Instagram
-            logged_in_context = await login_to_instagram(username, password, browser)
+            # Call scrape_stories with the logged in context
+            result = await scrape_stories(context, target_username, start_from=start_from)
             
-            # Randomly select a target username
-            random.shuffle(target_usernames)
-            random_username = target_usernames[0]
-            random_username = "arianagrande"
+            # Check the status code from the result
+            status = result.get("status", "UNKNOWN")
+            stories = result.get("data", [])
             
-            # Scraping with retry mechanism
-            max_retry_attempts = 3
-            retry_count = 0
-            last_story_num = 0
-            all_stories_data = []
+            # Add any new stories to our collection
+            all_stories_data.extend(stories)
             
-            print(f"\n{'='*50}\nStarting story scraping for: {random_username}\n{'='*50}\n")
+            # Update our last processed story
+            if ("last_processed_story" in result):
+                last_story_num = result["last_processed_story"]
             
-            while retry_count < max_retry_attempts:
-                try:
-                    # Start from the story after the last one we processed
-                    start_from = last_story_num + 1
-                    
-                    # Call scrape_stories with the logged in context
-                    result = await scrape_stories(logged_in_context, random_username, start_from=start_from)
-                    
-                    # Check the status code from the result
-                    status = result.get("status", "UNKNOWN")
-                    stories = result.get("data", [])
-                    
-                    # Add any new stories to our collection
-                    all_stories_data.extend(stories)
-                    
-                    # Update our last processed story
-                    if ("last_processed_story" in result):
-                        last_story_num = result["last_processed_story"]
-                    
-                    if (status == "SUCCESS"):
-                        print(f"Successfully completed story scraping with {len(stories)} stories")
-                        break  # Exit retry loop on success
-                        
-                    elif (status == "VIDEO_STORY_BLOCKER"):
-                        print(f"Encountered problematic video story at position {last_story_num}")
-                        print(f"Collected {len(stories)} stories before getting blocked")
-                        
-                        # Increment retry counter only for video story blockers
-                        retry_count += 1
-                        
-                        # If we have a lot of stories already, consider it good enough
-                        if (len(all_stories_data) >= 5):
-                            print("Already collected a reasonable number of stories, ending gracefully")
-                            break
-                        
-                        print(f"Will retry from story #{start_from + 1}")
-                        
-                    elif (status == "NO_STORIES"):
-                        print("Target has no active stories")
-                        break  # No need to retry
-                        
-                    else:  # Any other status like ERROR or UNKNOWN
-                        print(f"Received status: {status}, not retrying")
-                        if (stories):
-                            print(f"Still collected {len(stories)} stories")
-                        break  # Don't retry for general errors
+            if (status == "SUCCESS"):
+                print(f"Successfully completed story scraping with {len(stories)} stories")
+                break  # Exit retry loop on success
+                
+            elif (status == "VIDEO_STORY_BLOCKER"):
+                print(f"Encountered problematic video story at position {last_story_num}")
+                print(f"Collected {len(stories)} stories before getting blocked")
+                
+                # Increment retry counter only for video story blockers
+                retry_count += 1
+                
+                # If we have a lot of stories already, consider it good enough
+                if (len(all_stories_data) >= 5):
+                    print("Already collected a reasonable number of stories, ending gracefully")
+                    break
+                
+                print(f"Will retry from story #{start_from + 1}")
+                
+            elif (status == "NO_STORIES"):
+                print("Target has no active stories")
+                break  # No need to retry
                 
-                except Exception as e:
-                    print(f"Unexpected error during story scraping: {e}")
-                    break  # Don't retry for unexpected errors
+            else:  # Any other status like ERROR or UNKNOWN
+                print(f"Received status: {status}, not retrying")
+                if (stories):
+                    print(f"Still collected {len(stories)} stories")
+                break  # Don't retry for general errors
+        
+        except Exception as e:
+            print(f"Unexpected error during story scraping: {e}")
+            status = "ERROR"
+            break  # Don't retry for unexpected errors
+    
+    print(f"\n{'='*50}\nCompleted story scraping for: {target_username} with {len(all_stories_data)} total stories\n{'='*50}\n")
+    return {
+        "status": status,
+        "data": all_stories_data
+    }
+
+async def run_story_targets(target_usernames: List[str], account: Optional[Account] = None) -> Dict[str, Any]:
+    """Log in once and scrape the stories of every target in turn"""
+    browser = None
+    stats = {'targets': len(target_usernames), 'stories': 0}
+    started = time.monotonic()
+    
+    try:
+        async with async_playwright() as p:
+            browser = await launch_browser(p)
+            
+            # Login to Instagram
+            logged_in_context = await open_instagram_session(browser, account=account)
             
-            print(f"\n{'='*50}\nCompleted story scraping for: {random_username} with {len(all_stories_data)} total stories\n{'='*50}\n")
+            stats.update(await scrape_cycle(logged_in_context, target_usernames))
     
     except Exception as e:
         print(f"Error in main execution: {e}")
+        stats['error'] = str(e)
     
     finally:
         # Always ensure browser is closed, even if errors occurred
+        await close_downloader()
+        media_store.report()
+        media_store.close()
         if browser:
             print("Ensuring browser is properly closed...")
             await close_browser_properly(browser)
+    
+    stats['elapsed'] = round(time.monotonic() - started, 1)
+    return stats
+
+async def ensure_session() -> Optional[str]:
+    """Verify (or log in) once before the shards start and return the account's username (None on failure),
+    so every worker opens that freshly verified session instead of acquiring another account"""
+    async with async_playwright() as p:
+        browser = await launch_browser(p)
+        try:
+            account = session_manager.acquire()
+            context = await open_instagram_session(browser, policy=None, account=account)
+            await context.close()
+            return account.username
+        except Exception as e:
+            print(f"Session check failed: {e}")
+            return None
+        finally:
+            await browser.close()
+
+async def launch_browser(p) -> Browser:
+    return await p.chromium.launch(headless=True)
+
+async def open_session(browser: Browser) -> Optional[BrowserContext]:
+    """Logged-in context reused by every daemon cycle, None if login fails"""
+    try:
+        return await open_instagram_session(browser)
+    except Exception as e:
+        print(f"Login failed: {e}")
+        return None
+
+async def scrape_cycle(context: BrowserContext, target_usernames: List[str]) -> Dict[str, Any]:
+    """One daemon cycle over every target with the warm context"""
+    stats = {'targets': len(target_usernames), 'stories': 0, 'succeeded': 0, 'failed': 0}
+    rate_limiter.reset_stats()
+    for target_username in target_usernames:
+        result = await scrape_target_stories(context, target_username)
+        stats['stories'] += len(result["data"])
+        # Per-target outcome: the daemon rebuilds the session when every target fails
+        if (result["status"] in STORY_FAILURE_STATUSES):
+            stats['failed'] += 1
+        else:
+            stats['succeeded'] += 1
+    stats['rate_limiter'] = dict(rate_limiter.report())
+    return stats
+
+async def run_daemon(interval: float = CYCLE_INTERVAL, metrics_port: int = METRICS_PORT, metrics_file: str = METRICS_FILE):
+    """Scrape TARGET_USERNAMES every interval seconds with one browser kept warm"""
+    async def run_cycle(context: BrowserContext) -> Dict[str, Any]:
+        stats = await scrape_cycle(context, TARGET_USERNAMES)
+        if (metrics_file):
+            metrics.write(metrics_file)
+        return stats
+
+    daemon = ScrapeDaemon(
+        launch_browser=launch_browser,
+        open_session=open_session,
+        run_cycle=run_cycle,
+        close_session=lambda context: context.close(),
+        interval=interval
+    )
+    if (metrics_port):
+        metrics.serve(metrics_port)
+    try:
+        await daemon.run()
+    finally:
+        await close_downloader()
+        media_store.close()
+        metrics.close()
+
+def scrape_shard(target_usernames: List[str], account: Optional[str] = None) -> Dict[str, Any]:
+    """Entry point of one sharded worker process; its metrics are merged by the parent"""
+    stats = asyncio.run(run_story_targets(target_usernames,
+                                          session_manager.get(account) if (account) else None))
+    stats['metrics'] = metrics.snapshot()
+    return stats
+
+async def main(metrics_file: str = METRICS_FILE):
+    # Randomly select a target username
+    target_usernames = list(TARGET_USERNAMES)
+    random.shuffle(target_usernames)
+    random_username = target_usernames[0]
+    random_username = "arianagrande"
+    
+    await run_story_targets([random_username])
+    if (metrics_file):
+        metrics.write(metrics_file)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', default='1',
+                        help="worker processes over all TARGET_USERNAMES: a number, or 'auto' to size from cores and memory")
+    parser.add_argument('--debug-artifacts', choices=DEBUG_LEVELS,
+                        help="debug screenshots: off, on-failure (default, kept in memory) or always")
+    parser.add_argument('--media-capture', choices=('network', 'download'),
+                        help="story media from the viewer's own network responses (default) or downloaded again")
+    parser.add_argument('--story-waits', choices=('signals', 'fixed'),
+                        help="wait on navigation signals (default) or replay the old fixed sleeps as a latency baseline")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep scraping all TARGET_USERNAMES with a warm browser instead of exiting after one run")
+    parser.add_argument('--interval', type=float, default=CYCLE_INTERVAL,
+                        help="seconds between daemon cycles")
+    parser.add_argument('--metrics-file', default=METRICS_FILE,
+                        help="write Prometheus text metrics to this file after each run")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help="serve Prometheus metrics on this local port in daemon mode")
+    args = parser.parse_args()
+    if args.debug_artifacts:
+        # Through the environment so sharded worker processes pick it up too
+        os.environ["DEBUG_ARTIFACTS"] = args.debug_artifacts
+        debug_artifacts.level = args.debug_artifacts
+    if args.media_capture:
+        os.environ["STORY_MEDIA_CAPTURE"] = args.media_capture
+        STORY_MEDIA_CAPTURE = args.media_capture
+    if args.story_waits:
+        os.environ["STORY_WAITS"] = args.story_waits
+        STORY_WAITS = args.story_waits
+    
+    if args.daemon:
+        asyncio.run(run_daemon(args.interval, args.metrics_port, args.metrics_file))
+    elif args.shards == '1':
+        asyncio.run(main(args.metrics_file))
+    else:
+        # Every shard opens the session verified here
+        account = asyncio.run(ensure_session())
+        if (account):
+            shards = None if args.shards == 'auto' else int(args.shards)
+            results = run_sharded(functools.partial(scrape_shard, account=account), TARGET_USERNAMES, shards)
+            print(f"Saved {sum(r.get('stories', 0) for r in results)} stories across {len(results)} shards")
+            if args.metrics_file:
+                for result in results:
+                    metrics.merge(result.get('metrics'))
+                metrics.write(args.metrics_file)
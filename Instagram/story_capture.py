@@ -0,0 +1,219 @@
+# Story media captured from the browser's own network responses.
+# The story loop used to read img.src and download the same bytes again
+# over aiohttp, and video stories were only screenshotted. The reels JSON
+# the viewer loads maps every story's media id to its CDN image and video
+# URLs; the image and video responses the browser then receives for those
+# URLs are written straight to the media store under that media id.
+# Video that arrives in byte ranges is reassembled and stored once every
+# byte has been seen. The size comes from Content-Range, or for DASH-style
+# bytestart/byteend query ranges from the final segment, which is shorter
+# than the range it asked for. A query-ranged video whose end never showed
+# up is stored as its contiguous prefix when the capture finishes, marked
+# partial, rather than dropped.
+
+import asyncio
+from urllib.parse import urlparse, parse_qs
+
+REELS_URL_MARKERS = ('/api/v1/feed/reels_media', '/api/v1/feed/user/', '/graphql/query', '/api/graphql')
+CDN_HOST_MARKERS = ('cdninstagram.com', 'fbcdn.net')
+
+
+def is_reels_response(url: str) -> bool:
+    return any(marker in url for marker in REELS_URL_MARKERS)
+
+
+def _media_id(item: dict):
+    # Story URLs use the numeric pk; ids come as "<pk>_<owner id>"
+    if item.get('pk'):
+        return str(item['pk'])
+    if item.get('id'):
+        return str(item['id']).split('_')[0]
+    return None
+
+
+def _story_items(node):
+    """Walk a reels payload (REST or GraphQL) and yield every media item"""
+    if isinstance(node, dict):
+        if 'image_versions2' in node and _media_id(node):
+            yield node
+            return
+        for value in node.values():
+            yield from _story_items(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _story_items(value)
+
+
+def parse_reel_assets(payload) -> dict:
+    """CDN path -> (media id, 'image' | 'video', width) for every version of every story"""
+    assets = {}
+    for item in _story_items(payload):
+        media_id = _media_id(item)
+        for candidate in (item.get('image_versions2') or {}).get('candidates') or []:
+            if candidate.get('url'):
+                assets[urlparse(candidate['url']).path] = (media_id, 'image', candidate.get('width') or 0)
+        for version in item.get('video_versions') or []:
+            if version.get('url'):
+                assets[urlparse(version['url']).path] = (media_id, 'video', version.get('width') or 0)
+    return assets
+
+
+def _byte_range(response, headers: dict, size: int):
+    """(start, total, from query) when the body of length size is only part of the file, None for a whole file"""
+    content_range = headers.get('content-range', '')
+    if content_range.startswith('bytes '):
+        span, _, total = content_range[len('bytes '):].partition('/')
+        start = int(span.split('-')[0])
+        return start, int(total) if total.isdigit() else None, False
+    # DASH-style byte ranges in the query string: the CDN answers 200 with
+    # just the requested bytes, so only a short final segment gives the size
+    query = parse_qs(urlparse(response.url).query)
+    if 'bytestart' in query:
+        start = int(query['bytestart'][0])
+        end = query.get('byteend')
+        if end and size < int(end[0]) - start + 1:
+            return start, start + size, True
+        return start, None, True
+    return None
+
+
+class StoryMediaCapture:
+    """Stores the story images and videos a page receives, keyed by story media id"""
+
+    def __init__(self, page, media_store, username: str):
+        self.page = page
+        self.media_store = media_store
+        self.username = username
+        self.assets = {}
+        self.captured = {}      # media id -> {'image_file_id': ..., 'video_file_id': ...}
+        self._ranges = {}       # CDN path -> {start: bytes} for partially received videos
+        self._totals = {}
+        self._query_ranged = {}  # CDN path -> (url, media id, width, content type) of DASH-style videos
+        self._stored_paths = set()
+        self._events = {}
+        self._tasks = set()
+
+    def attach(self):
+        # Must be attached before page.goto so the reels payload is seen
+        self.page.on("response", self._on_response)
+
+    def detach(self):
+        self.page.remove_listener("response", self._on_response)
+
+    def _event(self, media_id: str, kind: str) -> asyncio.Event:
+        return self._events.setdefault((media_id, kind), asyncio.Event())
+
+    async def _on_response(self, response):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            if is_reels_response(response.url):
+                await self._read_reels(response)
+            elif any(marker in (urlparse(response.url).hostname or '') for marker in CDN_HOST_MARKERS):
+                await self._read_media(response)
+        except Exception as e:
+            print(f"Story capture failed for {response.url[:80]}: {e}")
+        finally:
+            self._tasks.discard(task)
+
+    async def _read_reels(self, response):
+        headers = await response.all_headers()
+        if 'json' not in headers.get('content-type', ''):
+            return
+        self.assets.update(parse_reel_assets(await response.json()))
+
+    async def _read_media(self, response):
+        path = urlparse(response.url).path
+        asset = self.assets.get(path)
+        if not asset or path in self._stored_paths or response.status not in (200, 206):
+            return
+        media_id, kind, width = asset
+        body = await response.body()
+        headers = await response.all_headers()
+
+        byte_range = _byte_range(response, headers, len(body)) if kind == 'video' else None
+        if byte_range:
+            start, total, from_query = byte_range
+            if from_query:
+                self._query_ranged[path] = (response.url, media_id, width, headers.get('content-type'))
+            body = self._add_range(path, start, total, body)
+            if body is None:
+                return  # Still waiting for more of the file
+        await self._store(path, response.url, media_id, kind, width, body, headers.get('content-type'))
+
+    def _add_range(self, path: str, start: int, total, body: bytes):
+        """Keep a byte range, return the whole file once it is contiguous up to the total size"""
+        chunks = self._ranges.setdefault(path, {})
+        chunks[start] = body
+        if total is not None:
+            self._totals[path] = total
+        total = self._totals.get(path)
+        if total is None:
+            return None
+
+        assembled = self._prefix(path)
+        if len(assembled) < total:
+            return None
+        del self._ranges[path]
+        return assembled[:total]
+
+    def _prefix(self, path: str) -> bytes:
+        """The received bytes of path that are contiguous from offset 0"""
+        assembled = bytearray()
+        for offset, chunk in sorted(self._ranges.get(path, {}).items()):
+            if offset > len(assembled):
+                break  # A gap, the rest is not usable yet
+            assembled += chunk[len(assembled) - offset:]
+        return bytes(assembled)
+
+    async def _store(self, path: str, url: str, media_id: str, kind: str, width: int, data: bytes, content_type,
+                     partial: bool = False):
+        self._stored_paths.add(path)
+        extension = 'mp4' if kind == 'video' else 'jpg'
+        file_id = await self.media_store.put_deduplicated(
+            data,
+            url=url,
+            filename=f"{self.username}_{media_id}.{extension}",
+            post_id=media_id,
+            target=self.username,
+            platform="Instagram",
+            content_type=content_type,
+            media_kind=kind,
+            width=width,
+            **({'partial': True} if partial else {})
+        )
+        self.captured.setdefault(media_id, {}).update({
+            f'{kind}_file_id': file_id,
+            f'{kind}_url': url,
+            f'{kind}_width': width,
+            **({f'{kind}_partial': True} if partial else {}),
+        })
+        self._event(media_id, kind).set()
+        print(f"📥 Captured {kind} for story {media_id} from the network ({len(data) // 1024} KB"
+              f"{', partial' if partial else ''})")
+
+    async def media_for(self, media_id: str, kind: str = 'image', timeout: float = 2.0) -> dict:
+        """Captured fields for a story once its media of the given kind is stored, {} on timeout"""
+        if not media_id:
+            return {}
+        try:
+            await asyncio.wait_for(self._event(media_id, kind).wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        return dict(self.captured.get(media_id, {}))
+
+    async def finish(self) -> dict:
+        """Wait for in-flight captures and return everything stored, by media id"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        # DASH-style videos whose final segment never arrived (the viewer moved
+        # on, or the last segment filled its range exactly): keep what plays
+        for path in list(self._ranges):
+            prefix = self._prefix(path)
+            if path in self._query_ranged and prefix and path not in self._stored_paths:
+                url, media_id, width, content_type = self._query_ranged[path]
+                del self._ranges[path]
+                await self._store(path, url, media_id, 'video', width, prefix, content_type, partial=True)
+        if self._ranges:
+            print(f"⚠️ {len(self._ranges)} story videos were only partly received, not stored")
+        return self.captured
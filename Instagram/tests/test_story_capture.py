@@ -0,0 +1,103 @@
+# StoryMediaCapture against recorded reels JSON and hand-built CDN responses.
+# Run from Instagram/: python -m unittest discover tests
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from story_capture import StoryMediaCapture
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "instagram_reels_video.json")
+REELS_URL = "https://www.instagram.com/api/v1/feed/reels_media/?reel_ids=5550000001"
+MEDIA_ID = "3400000000000000002"
+# Not a multiple of the segment size, so the last segment comes back short
+VIDEO = bytes(range(256)) * 40 + b"tail"
+SEGMENT = 4096
+
+
+class FakeResponse:
+    def __init__(self, url: str, body: bytes, headers: dict = None, status: int = 200):
+        self.url = url
+        self.status = status
+        self._body = body
+        self._headers = headers or {}
+
+    async def body(self):
+        return self._body
+
+    async def json(self):
+        return json.loads(self._body)
+
+    async def all_headers(self):
+        return self._headers
+
+
+class FakePage:
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+
+class FakeMediaStore:
+    def __init__(self):
+        self.stored = []
+
+    async def put_deduplicated(self, data: bytes, url: str, filename: str, post_id, target: str,
+                               platform: str, **fields):
+        self.stored.append({'data': data, 'post_id': post_id, **fields})
+        return f"file_{len(self.stored)}"
+
+
+def video_url() -> str:
+    with open(FIXTURE, encoding="utf-8") as f:
+        return json.load(f)["reels_media"][0]["items"][0]["video_versions"][0]["url"]
+
+
+def segment(start: int, end: int) -> FakeResponse:
+    """The CDN's answer to a DASH request for bytes start..end of the video"""
+    return FakeResponse(f"{video_url()}&bytestart={start}&byteend={end}", VIDEO[start:end + 1],
+                        {'content-type': 'video/mp4'})
+
+
+class QueryRangedVideoTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.store = FakeMediaStore()
+        self.capture = StoryMediaCapture(FakePage(), self.store, "fixture_user")
+        with open(FIXTURE, "rb") as f:
+            await self.capture._on_response(FakeResponse(REELS_URL, f.read(), {'content-type': 'application/json'}))
+
+    async def test_split_segments_are_stored_whole(self):
+        ranges = [(start, start + SEGMENT - 1) for start in range(0, len(VIDEO), SEGMENT)]
+        # Out of order, like parallel segment fetches
+        for start, end in reversed(ranges):
+            await self.capture._on_response(segment(start, end))
+
+        captured = await self.capture.finish()
+        self.assertEqual(len(self.store.stored), 1)
+        self.assertEqual(self.store.stored[0]['data'], VIDEO)
+        self.assertNotIn('partial', self.store.stored[0])
+        self.assertEqual(captured[MEDIA_ID]['video_file_id'], "file_1")
+        self.assertNotIn('video_partial', captured[MEDIA_ID])
+
+    async def test_missing_final_segment_stores_prefix_as_partial(self):
+        await self.capture._on_response(segment(0, SEGMENT - 1))
+        await self.capture._on_response(segment(SEGMENT, 2 * SEGMENT - 1))
+        self.assertEqual(self.store.stored, [])
+
+        captured = await self.capture.finish()
+        self.assertEqual(self.store.stored[0]['data'], VIDEO[:2 * SEGMENT])
+        self.assertTrue(self.store.stored[0]['partial'])
+        self.assertTrue(captured[MEDIA_ID]['video_partial'])
+
+    async def test_gap_at_the_start_is_not_stored(self):
+        await self.capture._on_response(segment(SEGMENT, 2 * SEGMENT - 1))
+        await self.capture.finish()
+        self.assertEqual(self.store.stored, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# Benchmark: files/sec for a new ClientSession per download (old behaviour)
+# vs the shared pooled MediaDownloader, against a local aiohttp test server.
+#
+# Usage: python benchmarks/bench_downloader.py [--files 500] [--size 65536] [--concurrency 8]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+X_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [X_DIR, os.path.dirname(X_DIR)]
+from scraper_common.downloader import MediaDownloader
+
+
+async def start_server(payload):
+    async def media(request):
+        return web.Response(body=payload, content_type="image/jpeg")
+
+    app = web.Application()
+    app.router.add_get("/media/{name}", media)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def per_call_session(url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            return len(await response.read())
+
+
+def pooled(downloader):
+    async def fetch(url):
+        async with downloader.get(url) as response:
+            return len(await response.read())
+    return fetch
+
+
+async def run(fetch, urls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(url):
+        async with semaphore:
+            return await fetch(url)
+
+    start = time.perf_counter()
+    sizes = await asyncio.gather(*(one(url) for url in urls))
+    elapsed = time.perf_counter() - start
+    return len(urls) / elapsed, sum(sizes)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--size", type=int, default=64 * 1024)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    runner, base_url = await start_server(os.urandom(args.size))
+    urls = [f"{base_url}/media/img{i}.jpg" for i in range(args.files)]
+    downloader = MediaDownloader()
+    try:
+        old_rate, _ = await run(per_call_session, urls, args.concurrency)
+        new_rate, _ = await run(pooled(downloader), urls, args.concurrency)
+    finally:
+        await downloader.close()
+        await runner.cleanup()
+
+    print(f"{args.files} files of {args.size} bytes, concurrency {args.concurrency}")
+    print(f"session per call : {old_rate:8.1f} files/sec")
+    print(f"pooled downloader: {new_rate:8.1f} files/sec ({new_rate / old_rate:.2f}x)")
+    print("Note: the local server is plain HTTP, a real CDN adds a TLS handshake per new session.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+# Benchmark: tweet extraction with one page.evaluate round trip vs the
+# original per-element Playwright calls, on the saved timeline fixture.
+# The fixture's non-pinned articles are repeated with fresh status ids to
+# reach the requested timeline length.
+#
+# The scroll section grows the timeline step by step, like infinite scroll,
+# and times one extraction per step for the full-DOM and incremental modes.
+#
+# Usage: python benchmarks/bench_extraction.py [--tweets 200] [--repeat 3] [--steps 40] [--per-step 10]
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+from playwright.async_api import async_playwright
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tweet_extract import extract_visible_tweets, extract_tweets_with_selectors
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "x_timeline.html")
+CELL_PATTERN = re.compile(r'<div data-testid="cellInnerDiv">.*?</article>\s*</div>', re.S)
+OWN_STATUS_PATTERN = re.compile(r'/fixture_user/status/(\d+)')
+
+
+def build_timeline_html(num_tweets: int) -> str:
+    """Return the fixture page grown to num_tweets non-pinned articles"""
+    with open(FIXTURE, encoding="utf-8") as f:
+        html = f.read()
+    cells = CELL_PATTERN.findall(html)
+    pinned = [cell for cell in cells if "socialContext" in cell]
+    regular = [cell for cell in cells if "socialContext" not in cell]
+
+    generated = []
+    next_id = 1900000000000000000 + num_tweets
+    for i in range(num_tweets):
+        cell = regular[i % len(regular)]
+        generated.append(OWN_STATUS_PATTERN.sub(f"/fixture_user/status/{next_id - i}", cell))
+
+    first, last = cells[0], cells[-1]
+    start = html.index(first)
+    end = html.index(last) + len(last)
+    return html[:start] + "\n".join(pinned + generated) + html[end:]
+
+
+def build_cells(num_tweets: int, first_id: int) -> str:
+    """Return num_tweets article cells with ids counting down from first_id"""
+    with open(FIXTURE, encoding="utf-8") as f:
+        cells = [c for c in CELL_PATTERN.findall(f.read()) if "socialContext" not in c]
+    return "\n".join(OWN_STATUS_PATTERN.sub(f"/fixture_user/status/{first_id - i}", cells[i % len(cells)])
+                     for i in range(num_tweets))
+
+
+async def time_scroll_steps(page, extractor, steps, per_step):
+    """Append per_step articles per step and time one extraction after each"""
+    await page.set_content(build_timeline_html(0))
+    timings = []
+    next_id = 1900000000000000000
+    for _ in range(steps):
+        cells = build_cells(per_step, next_id)
+        next_id -= per_step
+        await page.evaluate(
+            "html => document.querySelector('[aria-label^=\"Timeline\"]').insertAdjacentHTML('beforeend', html)",
+            cells)
+        start = time.perf_counter()
+        await extractor(page)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def time_extractor(page, extractor, repeat):
+    best = None
+    records = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = await extractor(page)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, records
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tweets", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--steps", type=int, default=40)
+    parser.add_argument("--per-step", type=int, default=10)
+    args = parser.parse_args()
+
+    html = build_timeline_html(args.tweets)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(html)
+
+        selectors_time, selector_records = await time_extractor(page, extract_tweets_with_selectors, args.repeat)
+        evaluate_time, evaluate_records = await time_extractor(page, extract_visible_tweets, args.repeat)
+
+        full_steps = await time_scroll_steps(page, extract_visible_tweets, args.steps, args.per_step)
+        incremental_steps = await time_scroll_steps(
+            page, lambda p: extract_visible_tweets(p, incremental=True), args.steps, args.per_step)
+        await browser.close()
+
+    evaluate_records = [r for r in evaluate_records if not r["pinned"]]
+    print(f"{args.tweets} tweets, best of {args.repeat}")
+    print(f"selectors: {selectors_time * 1000:8.1f} ms  ({len(selector_records)} records, "
+          f"{selectors_time / max(len(selector_records), 1) * 1e6:.0f} us/tweet)")
+    print(f"evaluate : {evaluate_time * 1000:8.1f} ms  ({len(evaluate_records)} records, "
+          f"{evaluate_time / max(len(evaluate_records), 1) * 1e6:.0f} us/tweet)")
+    print(f"speedup  : {selectors_time / evaluate_time:.1f}x")
+
+    print(f"\nInfinite scroll, {args.per_step} new tweets per step")
+    print(f"{'step':>6} | {'tweets in DOM':>13} | {'full DOM ms':>11} | {'incremental ms':>14}")
+    for step in range(0, args.steps, max(args.steps // 8, 1)):
+        print(f"{step + 1:>6} | {(step + 1) * args.per_step:>13} | "
+              f"{full_steps[step] * 1000:11.2f} | {incremental_steps[step] * 1000:14.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+# Benchmark: cost per tweet of the GraphQL engine against the DOM engine.
+# GraphQL: json.loads + parse_timeline_response on the recorded UserTweets
+# response in benchmarks/fixtures/x_user_tweets.json, its entries repeated
+# with fresh ids to model a long backfill page. DOM: one
+# extract_visible_tweets page.evaluate over the saved timeline fixture grown
+# to the same number of articles in headless Chromium (as bench_extraction.py
+# builds it). Both are wall-clock times for turning what the page received
+# into tweet records; --no-dom skips the browser and only times the parse.
+#
+# Usage: python benchmarks/bench_graphql.py [--tweets 2000] [--repeat 5] [--no-dom]
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_extraction import build_timeline_html
+from timeline_graphql import parse_timeline_response
+from tweet_extract import extract_visible_tweets
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "x_user_tweets.json")
+
+
+def build_payload(num_tweets: int) -> str:
+    """Return the fixture response as JSON text grown to num_tweets timeline entries"""
+    with open(FIXTURE, encoding="utf-8") as f:
+        payload = json.load(f)
+    instructions = payload["data"]["user"]["result"]["timeline_v2"]["timeline"]["instructions"]
+    add_entries = next(i for i in instructions if i["type"] == "TimelineAddEntries")
+    tweets = [e for e in add_entries["entries"] if e["content"]["entryType"] == "TimelineTimelineItem"]
+    cursors = [e for e in add_entries["entries"] if e["content"]["entryType"] != "TimelineTimelineItem"]
+
+    entries = []
+    for i in range(num_tweets):
+        entry = copy.deepcopy(tweets[i % len(tweets)])
+        result = entry["content"]["itemContent"]["tweet_results"]["result"]
+        result = result.get("tweet", result)
+        result["rest_id"] = str(1900000000000000000 + num_tweets - i)
+        entries.append(entry)
+    add_entries["entries"] = entries + cursors
+    return json.dumps(payload)
+
+
+def time_graphql(num_tweets: int, repeat: int):
+    raw = build_payload(num_tweets)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = parse_timeline_response(json.loads(raw))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, records, len(raw)
+
+
+async def time_dom(num_tweets: int, repeat: int):
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(build_timeline_html(num_tweets))
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            records = await extract_visible_tweets(page)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        await browser.close()
+    return best, records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tweets", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-dom", action="store_true", help="skip the Chromium DOM baseline")
+    args = parser.parse_args()
+
+    graphql_time, records, size = time_graphql(args.tweets, args.repeat)
+    print(f"{args.tweets} tweets, best of {args.repeat}")
+    print(f"graphql: {graphql_time * 1000:8.1f} ms  ({len(records)} records from {size / 1024:.0f} KiB of JSON, "
+          f"{graphql_time / len(records) * 1e6:.1f} us/tweet)")
+    if args.no_dom:
+        return
+
+    dom_time, dom_records = asyncio.run(time_dom(args.tweets, args.repeat))
+    print(f"dom    : {dom_time * 1000:8.1f} ms  ({len(dom_records)} records, "
+          f"{dom_time / max(len(dom_records), 1) * 1e6:.1f} us/tweet)")
+    print(f"speedup: {dom_time / graphql_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
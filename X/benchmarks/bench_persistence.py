@@ -0,0 +1,206 @@
+# Benchmark: write-side throughput of the persistence layer.
+# Drives the scrapers' own persistence code with synthetic data:
+#   documents  - BulkUpserter with its Watermark, one writer thread per
+#                target like concurrent profiles or shards, at several batch
+#                sizes (batch 1 is the old update_one per post)
+#   watermarks - Watermark.latest(), the per-profile incremental-stop read
+#   GridFS     - MediaStore.put_deduplicated with unique random images from
+#                concurrent tasks, like the media fan-out
+# and reports docs/sec, MB/sec and p50/p99 latency per write. Run it
+# against a mongod with the resources planned for the mongo service in
+# docker-compose.yml; everything is written to a scratch database that is
+# dropped afterwards. With --db mongomock only the document and watermark
+# sections run (MediaStore needs motor and a real server), with a single
+# writer since mongomock is not thread-safe and smaller defaults since it is
+# orders of magnitude slower: useful to smoke-test the harness but says
+# nothing about the container size.
+#
+# Usage: python benchmarks/bench_persistence.py [--db local|mongomock] [--uri mongodb://localhost:27017]
+#        [--docs 5000] [--batch-sizes 1,10,100,500] [--concurrency 1,4,16] [--images 200] [--image-kb 50,500]
+#        (mongomock defaults: --docs 500 --batch-sizes 1,100 --concurrency 1 --watermark-reads 200)
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+X_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [X_DIR, os.path.dirname(X_DIR)]
+from scraper_common import watermarks
+from scraper_common.bulk_writer import BulkUpserter
+from scraper_common.media_store import MediaStore
+from scraper_common.watermarks import Watermark, ensure_indexes
+
+BENCH_DB = 'scraper_persistence_bench'
+DEFAULTS = {'docs': 5000, 'batch_sizes': '1,10,100,500', 'concurrency': '1,4,16', 'watermark_reads': 2000}
+# mongomock is pure Python and not thread-safe: one writer and a smaller run
+MONGOMOCK_DEFAULTS = {'docs': 500, 'batch_sizes': '1,100', 'concurrency': '1', 'watermark_reads': 200}
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)] if ordered else 0.0
+
+
+def synthetic_post(target: str, index: int) -> dict:
+    """A post document shaped like the ones scrape_profile writes"""
+    posted_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(minutes=index)
+    return {
+        'post_id': str(1800000000000000000 + index),
+        'text': f"Synthetic post {index} from {target} with a link and a #hashtag " * 3,
+        'datetime': posted_at.isoformat().replace('+00:00', '.000Z'),
+        'image_urls': [f"https://pbs.twimg.com/media/{target}_{index}_{n}.jpg" for n in range(index % 3)],
+        'video_urls': [],
+        'links': ['https://example.com/article'] if index % 4 == 0 else [],
+        'embed_links': [],
+    }
+
+
+def write_target(db, target: str, num_docs: int, batch_size: int) -> list:
+    """Write num_docs posts for one target; returns the latency of every bulk write it triggered"""
+    collection = db[target]
+    ensure_indexes(collection, key='post_id')
+    watermark = Watermark(collection, key='post_id')
+    watermark.latest()
+    writer = BulkUpserter(collection, key='post_id', batch_size=batch_size,
+                          flush_interval=float('inf'), watermark=watermark)
+
+    latencies = []
+    for index in range(num_docs):
+        start = time.perf_counter()
+        writer.upsert(synthetic_post(target, index))
+        if not len(writer):
+            # This upsert filled the batch: bulk_write plus the watermark update
+            latencies.append(time.perf_counter() - start)
+    if len(writer):
+        start = time.perf_counter()
+        writer.flush()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_documents(client, num_docs: int, batch_size: int, writers: int) -> dict:
+    client.drop_database(BENCH_DB)
+    # Indexes are provisioned once per process, the dropped collections need them again
+    watermarks._indexed.clear()
+    db = client[BENCH_DB]
+    per_writer = num_docs // writers
+    start = time.perf_counter()
+    # BulkUpserter prints one line per flush
+    with contextlib.redirect_stdout(io.StringIO()):
+        if writers == 1:
+            # No thread at all: the mongomock client must stay on one thread
+            results = [write_target(db, "bench_target_0", per_writer, batch_size)]
+        else:
+            with ThreadPoolExecutor(max_workers=writers) as pool:
+                results = list(pool.map(lambda i: write_target(db, f"bench_target_{i}", per_writer, batch_size),
+                                        range(writers)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for result in results for latency in result]
+    return {'docs': per_writer * writers, 'writes': len(latencies), 'elapsed': elapsed,
+            'p50': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99)}
+
+
+def bench_watermarks(client, targets: int, reads: int) -> dict:
+    db = client[BENCH_DB]
+    readers = [Watermark(db[f"bench_target_{i}"], key='post_id') for i in range(targets)]
+    latencies = []
+    start = time.perf_counter()
+    for n in range(reads):
+        read_start = time.perf_counter()
+        readers[n % targets].latest()
+        latencies.append(time.perf_counter() - read_start)
+    elapsed = time.perf_counter() - start
+    return {'reads': reads, 'elapsed': elapsed,
+            'p50': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99)}
+
+
+async def bench_gridfs(uri: str, num_images: int, image_size: int, concurrency: int) -> dict:
+    store = MediaStore(BENCH_DB, uri=uri)
+    await store.db.client.drop_database(BENCH_DB)
+    # Unique bytes so every put is a real upload, not a dedup hit
+    images = [os.urandom(image_size) for _ in range(num_images)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def put(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await store.put_deduplicated(images[index], url=f"https://pbs.twimg.com/media/bench_{index}.jpg",
+                                         filename=f"bench_{index}.jpg", post_id=str(index),
+                                         target='bench_target', platform='benchmark')
+            latencies.append(time.perf_counter() - start)
+
+    await store.ensure_indexes()
+    start = time.perf_counter()
+    await asyncio.gather(*(put(index) for index in range(num_images)))
+    elapsed = time.perf_counter() - start
+    await store.db.client.drop_database(BENCH_DB)
+    store.close()
+    return {'images': num_images, 'bytes': num_images * image_size, 'elapsed': elapsed,
+            'p50': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", choices=("local", "mongomock"), default="local")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--docs", type=int, help="documents per run, split across the writers (default 5000)")
+    parser.add_argument("--batch-sizes", help="default 1,10,100,500")
+    parser.add_argument("--concurrency", help="default 1,4,16")
+    parser.add_argument("--images", type=int, default=200, help="images per GridFS run")
+    parser.add_argument("--image-kb", default="50,500", help="image sizes in KiB")
+    parser.add_argument("--watermark-reads", type=int, help="default 2000")
+    args = parser.parse_args()
+
+    for name, value in (MONGOMOCK_DEFAULTS if args.db == "mongomock" else DEFAULTS).items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+
+    batch_sizes = [int(value) for value in args.batch_sizes.split(',')]
+    concurrency = [int(value) for value in args.concurrency.split(',')]
+
+    if args.db == "mongomock":
+        if concurrency != [1]:
+            parser.error("--db mongomock is not thread-safe, use --concurrency 1")
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(args.uri)
+
+    print(f"Documents: BulkUpserter + Watermark, {args.docs} posts per run ({args.db})")
+    print(f"{'batch':>6} | {'writers':>7} | {'docs/sec':>9} | {'writes':>6} | {'p50 ms':>7} | {'p99 ms':>7}")
+    for batch_size in batch_sizes:
+        for writers in concurrency:
+            result = bench_documents(client, args.docs, batch_size, writers)
+            print(f"{batch_size:>6} | {writers:>7} | {result['docs'] / result['elapsed']:>9.0f} | "
+                  f"{result['writes']:>6} | {result['p50'] * 1000:>7.2f} | {result['p99'] * 1000:>7.2f}")
+
+    result = bench_watermarks(client, max(concurrency), args.watermark_reads)
+    print(f"\nWatermark.latest(): {result['reads'] / result['elapsed']:.0f} reads/sec, "
+          f"p50 {result['p50'] * 1000:.2f} ms, p99 {result['p99'] * 1000:.2f} ms")
+    client.drop_database(BENCH_DB)
+
+    if args.db == "mongomock":
+        print("\nGridFS: skipped, MediaStore uses motor and needs a real mongod (--db local)")
+        return
+
+    print(f"\nGridFS: MediaStore.put_deduplicated, {args.images} unique images per run")
+    print(f"{'KiB':>6} | {'tasks':>7} | {'MB/sec':>9} | {'img/sec':>7} | {'p50 ms':>7} | {'p99 ms':>7}")
+    for image_kb in [int(value) for value in args.image_kb.split(',')]:
+        for tasks in concurrency:
+            result = asyncio.run(bench_gridfs(args.uri, args.images, image_kb * 1024, tasks))
+            print(f"{image_kb:>6} | {tasks:>7} | {result['bytes'] / result['elapsed'] / 1024 / 1024:>9.1f} | "
+                  f"{result['images'] / result['elapsed']:>7.0f} | {result['p50'] * 1000:>7.2f} | "
+                  f"{result['p99'] * 1000:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Benchmark: the scrape_tweets hot loop end to end, offline.
+# A local server serves the saved timeline fixture as an infinite-scroll
+# profile page: every scroll near the bottom fetches the next batch of
+# articles (fresh status ids) and images are served locally, so the loop
+# runs through Chromium exactly as against x.com but without an account.
+# scrape_tweets is run once per extraction mode with the rate limiter
+# lifted; items/sec, Playwright calls per tweet and peak RSS are reported.
+#
+# Usage: python benchmarks/bench_scrape.py [--tweets 200] [--batch 10] [--modes incremental,evaluate,selectors] [--top 5]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+from playwright.async_api import async_playwright
+
+X_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [X_DIR, os.path.dirname(X_DIR)]
+from bench_extraction import build_timeline_html, build_cells
+from benchmarks.harness import FixtureServer, PlaywrightCalls, browser_peak_rss, disable_pacing, png_bytes, report
+from tweet_buffer import TweetBuffer
+from tweet_extract import ARTICLE_SELECTOR
+import x
+
+FIRST_STATUS_ID = 1900000000000000000
+MODES = ('incremental', 'evaluate', 'selectors')
+
+INFINITE_SCROLL_JS = """
+<style>article { min-height: 120px; }</style>
+<script>
+(() => {
+    const timeline = document.querySelector('[aria-label^="Timeline"]');
+    let offset = %(batch)d, loading = false;
+    async function loadMore() {
+        if (loading) return;
+        loading = true;
+        const response = await fetch(`/fixture_user/timeline?offset=${offset}`);
+        timeline.insertAdjacentHTML('beforeend', await response.text());
+        offset += %(batch)d;
+        loading = false;
+    }
+    // Like x.com: the next page is requested once the viewport nears the end
+    window.addEventListener('scroll', () => {
+        if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 1000) loadMore();
+    });
+})();
+</script>
+"""
+
+
+def local_media(html: str, server: FixtureServer) -> str:
+    return html.replace('https://pbs.twimg.com/', server.url('/pbs/'))
+
+
+def timeline_server(batch: int) -> FixtureServer:
+    server = FixtureServer()
+    image = png_bytes()
+
+    async def profile(request):
+        # The pinned tweet plus the first batch, ids counting down from FIRST_STATUS_ID + batch
+        html = build_timeline_html(batch).replace('</body>', INFINITE_SCROLL_JS % {'batch': batch} + '</body>', 1)
+        return web.Response(text=local_media(html, server), content_type='text/html')
+
+    async def timeline_page(request):
+        offset = int(request.query.get('offset', 0))
+        return web.Response(text=local_media(build_cells(batch, FIRST_STATUS_ID + batch - offset), server),
+                            content_type='text/html')
+
+    async def media(request):
+        return web.Response(body=image, content_type='image/png')
+
+    server.route('/fixture_user', profile)
+    server.route('/fixture_user/timeline', timeline_page)
+    server.route('/pbs/{path:.*}', media)
+    return server
+
+
+async def run_mode(browser, server, calls, mode, num_tweets, timeout):
+    page = await browser.new_page()
+    await page.goto(server.url('/fixture_user'))
+    await page.wait_for_selector(ARTICLE_SELECTOR)
+
+    calls.reset()
+    start = time.perf_counter()
+    tweets = await asyncio.wait_for(
+        x.scrape_tweets(page, TweetBuffer(), num_tweets=num_tweets, extraction=mode), timeout)
+    elapsed = time.perf_counter() - start
+    rss = browser_peak_rss()
+    await page.close()
+    return len(tweets.records()), elapsed, rss
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tweets", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=10, help="articles added per infinite-scroll fetch")
+    parser.add_argument("--modes", default=','.join(MODES))
+    parser.add_argument("--timeout", type=float, default=300, help="seconds before a mode is abandoned")
+    parser.add_argument("--top", type=int, default=0, help="also list the N most frequent Playwright calls")
+    args = parser.parse_args()
+
+    disable_pacing(x.rate_limiter)
+    server = await timeline_server(args.batch).start()
+    print(f"{args.tweets} tweets per mode from {server.url('/fixture_user')}, {args.batch} per scroll fetch")
+
+    with PlaywrightCalls() as calls:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            for mode in args.modes.split(','):
+                items, elapsed, rss = await run_mode(browser, server, calls, mode, args.tweets, args.timeout)
+                report(f"scrape_tweets/{mode}", items, elapsed, calls, rss, args.top)
+            await browser.close()
+    await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+# Micro-benchmark: per-tweet append cost of TweetBuffer vs the old
+# one-row DataFrame + pd.concat accumulation.
+#
+# Usage: python benchmarks/bench_tweet_buffer.py [--concat-max 5000]
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tweet_buffer import TweetBuffer, TWEET_COLUMNS
+
+SIZES = [10, 100, 1000, 10000, 50000]
+
+
+def make_tweet(i):
+    return {
+        'text': f"tweet number {i} " * 4,
+        'datetime': f"2024-01-01T00:00:{i % 60:02d}.000Z",
+        'images': [f"https://pbs.twimg.com/media/img{i}.jpg"],
+        'links': [],
+        'embed_links': []
+    }
+
+
+def concat_append(df, status_id, scraped_data):
+    # The pre-TweetBuffer implementation of add_to_dataframe
+    new_row = pd.DataFrame({
+        'status_id': [status_id],
+        'text': [scraped_data['text']],
+        'datetime': [scraped_data['datetime']],
+        'images': [scraped_data['images']],
+        'links': [scraped_data['links']],
+        'embed_links': [scraped_data['embed_links']]
+    })
+    return pd.concat([df, new_row], ignore_index=True)
+
+
+def bench_buffer(n, tweets):
+    buffer = TweetBuffer()
+    start = time.perf_counter()
+    for i in range(n):
+        buffer.append(str(i), tweets[i])
+    return time.perf_counter() - start
+
+
+def bench_concat(n, tweets):
+    df = pd.DataFrame(columns=list(TWEET_COLUMNS))
+    start = time.perf_counter()
+    for i in range(n):
+        df = concat_append(df, str(i), tweets[i])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concat-max', type=int, default=5000,
+                        help="skip the pd.concat baseline above this many tweets (it is quadratic)")
+    args = parser.parse_args()
+
+    tweets = [make_tweet(i) for i in range(max(SIZES))]
+
+    print(f"{'tweets':>8} | {'buffer us/tweet':>16} | {'concat us/tweet':>16}")
+    print("-" * 46)
+    for n in SIZES:
+        buffer_cost = bench_buffer(n, tweets) / n * 1e6
+        if n <= args.concat_max:
+            concat_cost = f"{bench_concat(n, tweets) / n * 1e6:16.2f}"
+        else:
+            concat_cost = f"{'skipped':>16}"
+        print(f"{n:>8} | {buffer_cost:16.2f} | {concat_cost}")
+
+    # Building the frame once at the end is a single O(n) step
+    buffer = TweetBuffer()
+    for i in range(max(SIZES)):
+        buffer.append(str(i), tweets[i])
+    start = time.perf_counter()
+    buffer.to_dataframe()
+    print(f"\nto_dataframe() for {max(SIZES)} tweets: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
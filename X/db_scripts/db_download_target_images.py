@@ -19,7 +19,10 @@ if not os.path.exists(download_directory):
 
 # Find and download files
 print(f"Downloading files for target '{target_name}'...")
-files = fs.find({"target": target_name})
+# Deduplicated files keep the first uploader's target, media_refs links
+# every other target to them by hash; older files only have the target field
+hashes = db["media_refs"].distinct("sha256", {"target": target_name})
+files = fs.find({"$or": [{"target": target_name}, {"sha256": {"$in": hashes}}]})
 for file in files:
     filename = file.filename
     file_path = os.path.join(download_directory, filename)
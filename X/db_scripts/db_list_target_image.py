@@ -11,7 +11,10 @@ fs = GridFS(db)
 target_name = "Elon Musk"  # target name
 
 # Find all files for this target
-files = fs.find({"target": target_name})
+# Deduplicated files keep the first uploader's target, media_refs links
+# every other target to them by hash; older files only have the target field
+hashes = db["media_refs"].distinct("sha256", {"target": target_name})
+files = fs.find({"$or": [{"target": target_name}, {"sha256": {"$in": hashes}}]})
 
 print(f"Files stored in GridFS for target '{target_name}':")
 for file in files:
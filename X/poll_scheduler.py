@@ -0,0 +1,105 @@
+# Adaptive per-target polling.
+# Instead of visiting every profile on the same fixed cron interval, each
+# target gets its own poll interval learned from the `datetime` values
+# already stored in its collection: accounts that post hourly are checked
+# often, dormant ones rarely. Due targets are handed out most-active first
+# under a global polls-per-hour budget shared by every target, so adding
+# targets does not raise the request rate the scraping account is exposed to.
+
+import datetime
+import math
+import statistics
+from scraper_common.watermarks import parse_datetime
+
+SCHEDULE_COLLECTION = 'scrape_schedule'
+MIN_INTERVAL = 15 * 60           # never poll a target more often than this (seconds)
+MAX_INTERVAL = 24 * 60 * 60      # dormant targets are still checked once a day
+DEFAULT_INTERVAL = 2 * 60 * 60   # targets without enough history keep the cron cadence
+MAX_POLLS_PER_HOUR = 60          # profile visits per hour across all targets
+HISTORY = 20                     # recent posts used to estimate the cadence
+POLLS_PER_GAP = 2                # polls per typical gap between two posts
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _aware(value):
+    # Dates read back from MongoDB are naive UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+class PollScheduler:
+    """Per-target next-due times derived from posting cadence, with a global hourly budget"""
+
+    def __init__(self, db, min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+                 max_polls_per_hour: int = MAX_POLLS_PER_HOUR, history: int = HISTORY):
+        self.db = db
+        self.schedule = db[SCHEDULE_COLLECTION]
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_polls_per_hour = max_polls_per_hour
+        self.history = history
+
+    def post_times(self, target: str) -> list:
+        """Newest-first datetimes of the target's latest stored posts (served by datetime_desc)"""
+        cursor = self.db[target].find({'datetime': {'$type': 'string'}}, {'datetime': 1, '_id': 0}) \
+            .sort('datetime', -1).limit(self.history)
+        return [posted_at for posted_at in (parse_datetime(doc['datetime']) for doc in cursor) if posted_at]
+
+    def interval(self, target: str, now=None) -> float:
+        """Seconds until the target should be polled again"""
+        now = now or _utcnow()
+        times = sorted(self.post_times(target), reverse=True)
+        if len(times) < 2:
+            return DEFAULT_INTERVAL
+
+        gaps = [(newer - older).total_seconds() for newer, older in zip(times, times[1:])]
+        typical_gap = statistics.median(gaps)
+        # An account that has gone quiet for longer than its usual gap slows down with it
+        typical_gap = max(typical_gap, (now - times[0]).total_seconds())
+        return min(max(typical_gap / POLLS_PER_GAP, self.min_interval), self.max_interval)
+
+    def polls_last_hour(self, now=None) -> int:
+        now = now or _utcnow()
+        hour_ago = now - datetime.timedelta(hours=1)
+        return sum(1 for doc in self.schedule.find({}, {'recent_polls': 1})
+                   for polled_at in doc.get('recent_polls', []) if _aware(polled_at) > hour_ago)
+
+    def due(self, targets: list, now=None) -> list:
+        """Targets whose next poll is due, most active first, capped by the remaining hourly budget"""
+        now = now or _utcnow()
+        state = {doc['_id']: doc for doc in self.schedule.find({'_id': {'$in': list(targets)}})}
+
+        due = []
+        for target in targets:
+            doc = state.get(target)
+            if doc is None:
+                # Never polled: due now, ordered by what history it already has
+                due.append((self.interval(target, now), now, target))
+            elif _aware(doc['next_due']) <= now:
+                due.append((doc['interval'], _aware(doc['next_due']), target))
+
+        # Shortest interval (most active) first, then the longest overdue
+        due.sort()
+        budget = max(self.max_polls_per_hour - self.polls_last_hour(now), 0)
+        if len(due) > budget:
+            print(f"Poll budget: {budget} of {len(due)} due targets this round, "
+                  f"{self.max_polls_per_hour}/hour limit")
+        return [target for _, _, target in due[:budget]]
+
+    def record(self, target: str, new_posts: int = 0, now=None):
+        """Store the poll and schedule the next one from the (now updated) post history"""
+        now = now or _utcnow()
+        interval = self.interval(target, now)
+        keep = math.ceil(3600 / self.min_interval) + 1
+        self.schedule.update_one(
+            {'_id': target},
+            {'$set': {'last_polled': now, 'interval': interval, 'last_new_posts': new_posts,
+                      'next_due': now + datetime.timedelta(seconds=interval)},
+             '$push': {'recent_polls': {'$each': [now], '$slice': -keep}}},
+            upsert=True
+        )
+        return interval
@@ -0,0 +1,177 @@
+# Network-interception engine for the X profile timeline.
+# The timeline is filled from UserTweets GraphQL responses; parsing that JSON
+# gives complete tweet records (full-resolution media, expanded links, quoted
+# tweets) without touching the DOM, so scrolling is the only browser work.
+# parse_timeline_response is pure and can be run on recorded JSON offline.
+#
+# Records use the same ids as the DOM engine, so switching engines neither
+# duplicates posts nor moves the watermark: a retweet is stored under the
+# retweeted tweet's id and time, like the permalink on its DOM article, and
+# carries its own id as timeline_id for the incremental-stop check.
+
+import asyncio
+import datetime
+import re
+
+TIMELINE_URL_PATTERN = re.compile(r'/graphql/[^/]+/(UserTweets|UserTweetsAndReplies|UserMedia)\b')
+X_STATUS_URL = "https://x.com/{screen_name}/status/{status_id}"
+
+
+def is_timeline_response(url: str) -> bool:
+    return bool(TIMELINE_URL_PATTERN.search(url))
+
+
+def _iso_datetime(created_at):
+    """'Mon Jun 10 12:30:00 +0000 2024' -> '2024-06-10T12:30:00.000Z', the DOM <time> format"""
+    if not created_at:
+        return None
+    try:
+        parsed = datetime.datetime.strptime(created_at, '%a %b %d %H:%M:%S %z %Y')
+    except (TypeError, ValueError):
+        return None
+    return parsed.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def _unwrap(result):
+    # Tweets with visibility labels are wrapped one level deeper
+    if result and result.get('__typename') == 'TweetWithVisibilityResults':
+        return result.get('tweet')
+    return result
+
+
+def _screen_name(tweet):
+    user = tweet.get('core', {}).get('user_results', {}).get('result', {})
+    return (user.get('legacy', {}).get('screen_name')
+            or user.get('core', {}).get('screen_name'))
+
+
+def _tweet_record(tweet, pinned=False):
+    """Turn a GraphQL Tweet result into the record shape scrape_tweets collects"""
+    tweet = _unwrap(tweet)
+    if not tweet or 'rest_id' not in tweet:
+        return None
+    timeline_id = tweet['rest_id']
+    legacy = tweet.get('legacy', {})
+
+    # For retweets the content, id and time come from the retweeted tweet, as
+    # in the DOM; the retweet's own id still orders the timeline
+    content_tweet = tweet
+    retweeted = _unwrap(legacy.get('retweeted_status_result', {}).get('result'))
+    if retweeted and retweeted.get('rest_id'):
+        content_tweet = retweeted
+        legacy = retweeted.get('legacy', {})
+    status_id = content_tweet['rest_id']
+    created_at = legacy.get('created_at')
+
+    note = content_tweet.get('note_tweet', {}).get('note_tweet_results', {}).get('result', {})
+    text = note.get('text') or legacy.get('full_text')
+
+    images, videos = [], []
+    for media in legacy.get('extended_entities', legacy.get('entities', {})).get('media', []):
+        if media.get('type') == 'photo':
+            images.append(f"{media['media_url_https']}?name=orig")
+        elif media.get('type') in ('video', 'animated_gif'):
+            variants = [v for v in media.get('video_info', {}).get('variants', [])
+                        if v.get('content_type') == 'video/mp4']
+            if variants:
+                videos.append(max(variants, key=lambda v: v.get('bitrate', 0))['url'])
+
+    links = [url['expanded_url'] for url in legacy.get('entities', {}).get('urls', [])
+             if url.get('expanded_url')]
+
+    embed_links = []
+    card_url = content_tweet.get('card', {}).get('legacy', {}).get('url')
+    if card_url:
+        embed_links.append(card_url)
+    quoted = _unwrap(content_tweet.get('quoted_status_result', {}).get('result'))
+    if quoted and quoted.get('rest_id'):
+        embed_links.append(X_STATUS_URL.format(screen_name=_screen_name(quoted) or 'i',
+                                               status_id=quoted['rest_id']))
+    elif legacy.get('quoted_status_permalink', {}).get('expanded'):
+        embed_links.append(legacy['quoted_status_permalink']['expanded'])
+
+    return {
+        'status_id': status_id,
+        'timeline_id': timeline_id,
+        'pinned': pinned,
+        'text': text,
+        'datetime': _iso_datetime(created_at),
+        'images': images,
+        'videos': videos,
+        'links': links,
+        'embed_links': embed_links
+    }
+
+
+def _entry_tweets(entry):
+    content = entry.get('content', {})
+    if content.get('entryType') == 'TimelineTimelineItem' or 'itemContent' in content:
+        yield content.get('itemContent', {}).get('tweet_results', {}).get('result')
+    elif content.get('entryType') == 'TimelineTimelineModule':
+        for item in content.get('items', []):
+            yield item.get('item', {}).get('itemContent', {}).get('tweet_results', {}).get('result')
+
+
+def _instructions(payload):
+    result = payload.get('data', {}).get('user', {}).get('result', {})
+    timeline = result.get('timeline_v2', result.get('timeline', {}))
+    return timeline.get('timeline', {}).get('instructions', [])
+
+
+def parse_timeline_response(payload: dict) -> list:
+    """Return tweet records from one UserTweets response, in timeline order"""
+    records = []
+    for instruction in _instructions(payload):
+        if instruction.get('type') == 'TimelinePinEntry':
+            entries, pinned = [instruction.get('entry', {})], True
+        elif instruction.get('type') == 'TimelineAddEntries':
+            entries, pinned = instruction.get('entries', []), False
+        else:
+            continue
+        for entry in entries:
+            for tweet in _entry_tweets(entry):
+                record = _tweet_record(tweet, pinned=pinned)
+                if record:
+                    records.append(record)
+    return records
+
+
+class TimelineInterceptor:
+    """Collects tweet records from a page's timeline GraphQL responses"""
+
+    def __init__(self, page):
+        self.page = page
+        self.records = asyncio.Queue()
+        self.responses = 0
+
+    def attach(self):
+        # Must be attached before page.goto so the first page of tweets is seen
+        self.page.on("response", self._on_response)
+
+    def detach(self):
+        self.page.remove_listener("response", self._on_response)
+
+    async def _on_response(self, response):
+        if not is_timeline_response(response.url):
+            return
+        # An exception here would escape the page's event handler, so a body
+        # that cannot be read or parsed is logged and skipped as a whole
+        try:
+            records = parse_timeline_response(await response.json())
+        except Exception as e:
+            print(f"Could not parse timeline response {response.url[:80]}: {e!r}")
+            return
+        self.responses += 1
+        for record in records:
+            self.records.put_nowait(record)
+
+    async def next_batch(self, timeout: float) -> list:
+        """Wait up to timeout seconds for records, then return everything queued"""
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self.records.get(), timeout))
+        except asyncio.TimeoutError:
+            return batch
+        while not self.records.empty():
+            batch.append(self.records.get_nowait())
+        return batch
@@ -0,0 +1,40 @@
+# Column-oriented accumulator for scraped tweets.
+# Appending a tweet is a handful of list appends, so the cost per tweet stays
+# flat no matter how many tweets are already buffered. A pandas DataFrame is
+# only built on demand through to_dataframe().
+
+TWEET_COLUMNS = ('status_id', 'text', 'datetime', 'images', 'videos', 'links', 'embed_links')
+
+
+class TweetBuffer:
+    """Per-column lists of scraped tweets"""
+
+    __slots__ = TWEET_COLUMNS
+
+    def __init__(self):
+        for column in TWEET_COLUMNS:
+            setattr(self, column, [])
+
+    def __len__(self):
+        return len(self.status_id)
+
+    def append(self, status_id, scraped_data):
+        """Add one tweet, scraped_data holds the same keys scrape_tweets builds"""
+        self.status_id.append(status_id)
+        self.text.append(scraped_data['text'])
+        self.datetime.append(scraped_data['datetime'])
+        self.images.append(scraped_data['images'])
+        self.videos.append(scraped_data.get('videos', []))
+        self.links.append(scraped_data.get('links', []))
+        self.embed_links.append(scraped_data.get('embed_links', []))
+
+    def records(self):
+        """Yield one dict per buffered tweet, in scrape order"""
+        for row in zip(*(getattr(self, column) for column in TWEET_COLUMNS)):
+            yield dict(zip(TWEET_COLUMNS, row))
+
+    def to_dataframe(self):
+        """Build a DataFrame with one column per tweet field"""
+        import pandas as pd
+        return pd.DataFrame({column: getattr(self, column) for column in TWEET_COLUMNS},
+                            columns=list(TWEET_COLUMNS))
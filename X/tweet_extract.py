@@ -0,0 +1,133 @@
+# Tweet extraction from the rendered X timeline.
+# extract_visible_tweets pulls every tweet article in a single page.evaluate
+# round trip. With incremental=True it only returns articles it has not
+# returned before: each resolved article is tagged with SEEN_ATTRIBUTE in
+# the page, so a scroll step only ships the newly rendered tweets.
+# extract_tweets_with_selectors is the original element-handle walk (6+
+# Playwright calls per article), kept as a fallback and as the benchmark
+# baseline.
+
+import asyncio
+import random
+
+ARTICLE_SELECTOR = "article[data-testid='tweet']"
+SEEN_ATTRIBUTE = "data-scraper-seen"
+
+EXTRACT_TWEETS_JS = '''
+({selector, seenAttribute}) => {
+    const statusPattern = /\\/status\\/(\\d+)/;
+    const unique = (values) => Array.from(new Set(values));
+
+    return Array.from(document.querySelectorAll(selector)).map(article => {
+        // Pinned tweets carry a "Pinned" social context line above the tweet
+        const social = article.querySelector("[data-testid='socialContext']");
+        const pinned = !!(social && social.textContent.includes('Pinned'));
+
+        // The permalink wraps the <time> element, fall back to any status link
+        const time = article.querySelector('time');
+        const statusLink = (time && time.closest('a[href*="/status/"]'))
+            || article.querySelector('a[href*="/status/"]');
+        const match = statusLink ? statusLink.getAttribute('href').match(statusPattern) : null;
+        const statusId = match ? match[1] : null;
+
+        // Only tag articles that have rendered their permalink, so a
+        // half-loaded article is picked up again on the next scroll step
+        if (seenAttribute && statusId) {
+            article.setAttribute(seenAttribute, statusId);
+        }
+
+        const textElement = article.querySelector("div[data-testid='tweetText']");
+
+        const images = Array.from(article.querySelectorAll("div[data-testid='tweetPhoto'] img"))
+            .map(img => img.getAttribute('src'))
+            .filter(src => src && !src.startsWith('blob:'));
+
+        // Outbound links in the text; mentions and hashtags are relative hrefs
+        const links = textElement
+            ? Array.from(textElement.querySelectorAll('a[href]'))
+                .map(a => a.getAttribute('href'))
+                .filter(href => /^https?:/.test(href))
+            : [];
+
+        // Link cards and quoted tweets
+        const embeds = Array.from(article.querySelectorAll("[data-testid='card.wrapper'] a[href]"))
+            .map(a => a.getAttribute('href'));
+        article.querySelectorAll('a[href*="/status/"]').forEach(a => {
+            const href = a.getAttribute('href');
+            const quoted = href.match(statusPattern);
+            if (quoted && quoted[1] !== statusId) {
+                embeds.push(href.split('/status/')[0] + '/status/' + quoted[1]);
+            }
+        });
+
+        return {
+            status_id: statusId,
+            pinned: pinned,
+            text: textElement ? textElement.innerText : null,
+            datetime: time ? time.getAttribute('datetime') : null,
+            images: images,
+            links: unique(links),
+            embed_links: unique(embeds)
+        };
+    });
+}
+'''
+
+
+async def extract_visible_tweets(page, incremental: bool = False) -> list:
+    """Extract tweet articles with one page.evaluate call, only unseen ones if incremental"""
+    if incremental:
+        args = {'selector': f"{ARTICLE_SELECTOR}:not([{SEEN_ATTRIBUTE}])", 'seenAttribute': SEEN_ATTRIBUTE}
+    else:
+        args = {'selector': ARTICLE_SELECTOR, 'seenAttribute': None}
+    return await page.evaluate(EXTRACT_TWEETS_JS, args)
+
+
+async def extract_tweets_with_selectors(page, visited_tweets=None) -> list:
+    """Extract tweets with per-element Playwright calls (original behaviour)"""
+    visited_tweets = visited_tweets or {}
+    records = []
+    articles = await page.query_selector_all(ARTICLE_SELECTOR)
+
+    for i in range(len(articles)):
+        try:
+            article = articles[i]
+
+            # Escape pinned posts
+            pinned = await article.query_selector("div:has-text('Pinned')")
+            if pinned:
+                continue
+
+            # Extract the status ID from the tweet URL
+            tweet_url_element = await article.query_selector("a[href*='/status/']")
+            tweet_url = await tweet_url_element.get_attribute('href')
+            status_id = tweet_url.split('/status/')[1]
+
+            record = {'status_id': status_id, 'pinned': False, 'text': None, 'datetime': None,
+                      'images': [], 'links': [], 'embed_links': []}
+
+            # Already scraped, the status id is enough for the caller
+            if visited_tweets.get(status_id):
+                records.append(record)
+                continue
+
+            tweet_text_element = await article.query_selector("div[data-testid='tweetText']")
+            record['text'] = await tweet_text_element.inner_text() if tweet_text_element else None
+
+            tweet_datetime_element = await article.query_selector("time")
+            record['datetime'] = await tweet_datetime_element.get_attribute('datetime') if tweet_datetime_element else None
+
+            # Filter out profile images and only scrape images that are part of the tweet content
+            tweet_images_elements = await article.query_selector_all("div[data-testid='tweetPhoto'] img")
+            record['images'] = [await img.get_attribute('src') for img in tweet_images_elements if "blob:" not in await img.get_attribute('src')]
+
+            records.append(record)
+
+        except Exception as e:
+            print(f"Error occurred while processing post {i + 1}: {e}")
+            sleep_duration = random.uniform(1, 5)  # Random sleep between 1 and 5 seconds
+            print(f"Retrying after {sleep_duration} seconds...")
+            await asyncio.sleep(sleep_duration)
+            continue
+
+    return records
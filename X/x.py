@@ -1,18 +1,69 @@
+import argparse
 import asyncio
+import functools
 import os
-import aiohttp
-import gridfs
+import sys
 from urllib.parse import urlparse
 from playwright.async_api import async_playwright, BrowserContext
 from pymongo import MongoClient
-import random
 import json
-import pandas as pd
 import time
+from tweet_buffer import TweetBuffer
+# scraper_common/ sits next to this script in the image and one level up in a checkout
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_common.resource_policy import ResourcePolicy
+from scraper_common.context_pool import ContextPool
+from scraper_common.shard_runner import run_sharded
+from scraper_common.daemon import ScrapeDaemon, CYCLE_INTERVAL
+from poll_scheduler import PollScheduler
+from scraper_common.session_manager import Account, SessionManager, load_accounts, X_AUTH_COOKIES
+from scraper_common.downloader import close_downloader
+from scraper_common.rate_limiter import get_rate_limiter
+from scraper_common.metrics import get_metrics
+from scraper_common.bulk_writer import BulkUpserter
+from scraper_common.watermarks import Watermark, ensure_indexes
+from scraper_common.media_store import MediaStore
+from scraper_common.media_queue import MediaFanout
+from tweet_extract import extract_visible_tweets, extract_tweets_with_selectors
+from timeline_graphql import TimelineInterceptor
+
+X_USERNAME = "@socialmedi51534"
+X_PASSWORD = "thisis_B0T"
+# Optional JSON list of {"username", "password", "session_file"} to rotate several accounts
+X_ACCOUNTS_FILE = os.environ.get("X_ACCOUNTS_FILE", "x_accounts.json")
+# Timeline engine: "dom" reads the rendered articles, "graphql" the intercepted UserTweets responses
+TIMELINE_ENGINE = os.environ.get("TIMELINE_ENGINE", "dom")
+# Prometheus text file written after each run, and a local /metrics port for the daemon
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+PROFILE_LINKS = [
+    "https://x.com/elonmusk",
+    "https://x.com/billgates",
+    # Add more profiles as needed
+]
 
 client = MongoClient('mongodb://localhost:27017')
 db = client['scraped_data_db']
-fs = gridfs.GridFS(db)
+media_store = MediaStore('scraped_data_db')
+poll_scheduler = PollScheduler(db)
+rate_limiter = get_rate_limiter()
+metrics = get_metrics()
+
+# Fonts, video previews, analytics and third-party scripts are never needed to read tweets
+resource_policy = ResourcePolicy(
+    block_types=('font', 'media'),
+    first_party_hosts=('x.com', 'twitter.com', 'twimg.com')
+)
+
+# Cookie expiry plus a verification TTL; the x.com/home check in login_to_x only runs once the TTL is up
+session_manager = SessionManager(
+    'x',
+    load_accounts(X_ACCOUNTS_FILE, X_USERNAME, X_PASSWORD, 'cookies.json'),
+    login=lambda browser, account, policy: login_to_x(account.username, account.password, browser,
+                                                      policy, cookies_file=account.session_file),
+    session_format='cookies',
+    auth_cookies=X_AUTH_COOKIES
+)
 
 user_agents = [
     # Windows
@@ -33,104 +84,74 @@ user_agents = [
 
 async def download_image_to_mongodb(image_url, post_id, username):
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(image_url) as response:
-                if response.status == 200:
-                    img_data = await response.read()
-                    img_name = f"{username}_{post_id}_{image_url.split('/')[-1]}"
-                    file_id = fs.put(
-                        img_data,
-                        filename=img_name,
-                        post_id=post_id,
-                        target=username,
-                        platform="X.com"
-                    )
-                    print(f"Image saved to MongoDB with file_id: {file_id}")
-                else:
-                    print(f"Failed to download {image_url} (Status: {response.status})")
+        # Known URLs only need a reference to the stored blob
+        if await media_store.link_known_url(image_url, post_id=post_id, target=username, platform="X.com"):
+            print(f"Image already stored, skipped download: {image_url}")
+            return True
+
+        # Streamed into GridFS in chunks, resumed with Range if the connection drops
+        img_name = f"{username}_{post_id}_{image_url.split('/')[-1]}"
+        with metrics.stage('download', username):
+            file_id = await media_store.download_deduplicated(
+                image_url,
+                filename=img_name,
+                post_id=post_id,
+                target=username,
+                platform="X.com"
+            )
+        print(f"Image saved to MongoDB with file_id: {file_id}")
+        return True
     except Exception as e:
         print(f"Error downloading image {image_url}: {str(e)}")
+        # Reported to MediaFanout as a failure, direct callers keep scraping
+        return False
+
+def collect_records(records, tweets, visited_tweets, num_tweets, latest_status_id=None):
+    # Add unseen tweet records to the buffer, returns True once scraping should stop
+    for record in records:
+        # Escape pinned posts and articles without a status link
+        status_id = record['status_id']
+        if record['pinned'] or not status_id:
+            continue
+
+        # If the tweet is older than the latest scraped tweet, stop scraping.
+        # GraphQL retweets are compared by their own id, not the retweeted tweet's
+        if latest_status_id and int(record.get('timeline_id') or status_id) <= int(latest_status_id):
+            print(f"Encountered tweet {status_id} which is older or same as latest status_id {latest_status_id}. Stopping scrape.")
+            return True
+
+        if visited_tweets.get(status_id):
+            continue
+
+        # Add to the tweet buffer and mark as visited
+        tweets.append(status_id, record)
+        visited_tweets[status_id] = True
+
+        if len(visited_tweets) >= num_tweets:
+            return True
+    return False
 
-def add_to_dataframe(df, status_id, scraped_data):
-    new_row = pd.DataFrame({
-        'status_id': [status_id],
-        'text': [scraped_data['text']],
-        'datetime': [scraped_data['datetime']],
-        'images': [scraped_data['images']],
-        'links': [scraped_data['links']],
-        'embed_links': [scraped_data['embed_links']]
-    })
-    return pd.concat([df, new_row], ignore_index=True)
-
-async def scrape_tweets(page, df, num_tweets=10, latest_status_id=None, max_retries=3):
-    tweets_counter = 0
+async def scrape_tweets(page, tweets, num_tweets=10, latest_status_id=None, max_retries=3, extraction='incremental', target=''):
     visited_tweets = {}
 
-    while tweets_counter < num_tweets:
+    while len(visited_tweets) < num_tweets:
         retry_counter = 0  # Initialize the retry counter
         while retry_counter < max_retries:
             try:
-                articles = await page.query_selector_all("article[data-testid='tweet']")
-                
-                for i in range(len(articles)):
-                    try:
-                        # Re-locate the article element to avoid stale reference
-                        article = articles[i]
-                        
-                        # Escape pinned posts
-                        pinned = await article.query_selector("div:has-text('Pinned')")
-                        if pinned:
-                            continue
-                        
-                        # Extract the status ID from the tweet URL
-                        tweet_url_element = await article.query_selector("a[href*='/status/']")
-                        tweet_url = await tweet_url_element.get_attribute('href')
-                        status_id = tweet_url.split('/status/')[1]
-                        
-                        # If the tweet is older than the latest scraped tweet, stop scraping
-                        if latest_status_id and int(status_id) <= int(latest_status_id):
-                            print(f"Encountered tweet {status_id} which is older or same as latest status_id {latest_status_id}. Stopping scrape.")
-                            return df
-                        
-                        if visited_tweets.get(status_id):
-                            continue
-                        
-                        # Wait until the tweet text div is visible
-                        tweet_text_element = await article.query_selector("div[data-testid='tweetText']")
-                        tweet_text = await tweet_text_element.inner_text() if tweet_text_element else None
-                        
-                        tweet_datetime_element = await article.query_selector("time")
-                        tweet_datetime = await tweet_datetime_element.get_attribute('datetime') if tweet_datetime_element else None
-                        
-                        # Filter out profile images and only scrape images that are part of the tweet content
-                        tweet_images_elements = await article.query_selector_all("div[data-testid='tweetPhoto'] img")
-                        tweet_images = [await img.get_attribute('src') for img in tweet_images_elements if "blob:" not in await img.get_attribute('src')]
-                        
-                        scraped_data = {
-                            'text': tweet_text,
-                            'datetime': tweet_datetime,
-                            'images': tweet_images,
-                            'links': [],  # Add logic to extract links if needed
-                            'embed_links': []  # Add logic to extract embed links if needed
-                        }
-                        
-                        # Add to DataFrame
-                        df = add_to_dataframe(df, status_id, scraped_data)
-                        
-                        # Mark as visited
-                        visited_tweets[status_id] = True
-                        tweets_counter += 1
-                        
-                        if tweets_counter >= num_tweets:
-                            break
-                
-                    except Exception as e:
-                        print(f"Error occurred while processing post {i + 1}: {e}")
-                        sleep_duration = random.uniform(1, 5)  # Random sleep between 1 and 5 seconds
-                        print(f"Retrying after {sleep_duration} seconds...")
-                        await asyncio.sleep(sleep_duration)
-                        continue
-                
+                # 'incremental' reads only tweets added since the last scroll,
+                # 'evaluate' reads every tweet in the DOM in one round trip,
+                # 'selectors' makes several Playwright calls per article
+                with metrics.stage('extraction', target):
+                    if extraction == 'incremental':
+                        records = await extract_visible_tweets(page, incremental=True)
+                    elif extraction == 'evaluate':
+                        records = await extract_visible_tweets(page)
+                    else:
+                        records = await extract_tweets_with_selectors(page, visited_tweets)
+
+                if collect_records(records, tweets, visited_tweets, num_tweets, latest_status_id):
+                    return tweets
+
                 break  # Break the retry loop if no errors
             
             except Exception as e:
@@ -140,72 +161,137 @@ async def scrape_tweets(page, df, num_tweets=10, latest_status_id=None, max_retr
                     print("Exceeded maximum retries for current operation.")
                     break  # Exit retry loop after max retries
         
-        await page.evaluate('window.scrollBy(0, 500);')
-        await asyncio.sleep(random.uniform(0.5, 2))  # Add random waits after scrolling
+        # Scrolls that load more tweets are paced by the shared account/host budget
+        await rate_limiter.acquire(page.url)
+        with metrics.stage('scroll', target):
+            await page.evaluate('window.scrollBy(0, 500);')
     
-    return df
+    return tweets
 
-async def scrape_profile(context: BrowserContext, profile_link: str, post_limit: int = 10):
-    page = await context.new_page()
+async def scrape_tweets_graphql(page, interceptor, tweets, num_tweets=10, latest_status_id=None, max_idle_scrolls=5, response_timeout=5, target=''):
+    # Tweets come from the intercepted UserTweets responses, the page is only scrolled
+    visited_tweets = {}
+    idle_scrolls = 0
+
+    while len(visited_tweets) < num_tweets and idle_scrolls < max_idle_scrolls:
+        with metrics.stage('extraction', target):
+            records = await interceptor.next_batch(timeout=response_timeout)
+        if records:
+            idle_scrolls = 0
+            if collect_records(records, tweets, visited_tweets, num_tweets, latest_status_id):
+                break
+        else:
+            idle_scrolls += 1
+
+        # Scrolling to the bottom makes the timeline request its next cursor page
+        await rate_limiter.acquire(page.url)
+        with metrics.stage('scroll', target):
+            await page.evaluate('window.scrollTo(0, document.body.scrollHeight);')
+
+    if idle_scrolls >= max_idle_scrolls:
+        print(f"No new timeline responses after {max_idle_scrolls} scrolls, stopping.")
+    return tweets
+
+async def scrape_profile(context: BrowserContext, profile_link: str, post_limit: int = 10, media_queue: MediaFanout = None, engine: str = 'dom', page=None):
+    # Returns the number of posts written, or None if the profile could not be scraped.
+    # A page lent by a ContextPool is reused, otherwise open (and later close) our own
+    owns_page = page is None
+    if owns_page:
+        page = await context.new_page()
     username = urlparse(profile_link).path.strip('/')
 
     collection = db[username]
-    latest_post = collection.find_one({}, sort=[('datetime', -1)])
-    latest_post_id = latest_post['post_id'] if latest_post else None
+    ensure_indexes(collection, key='post_id')
+    watermark = Watermark(collection, key='post_id')
+    latest_post_id = watermark.latest()
     print(f"Latest post ID in DB for {username}: {latest_post_id}")
 
-    df = pd.DataFrame(columns=['status_id', 'text', 'datetime', 'images', 'links', 'embed_links'])
+    tweets = TweetBuffer()
+    writer = BulkUpserter(collection, key='post_id', watermark=watermark, target=username)
+    failed = False
+
+    # engine='graphql' reads tweets from the timeline API responses instead of the DOM
+    interceptor = None
+    if engine == 'graphql':
+        interceptor = TimelineInterceptor(page)
+        interceptor.attach()
 
     try:
-        await page.goto(profile_link)
-        await page.wait_for_selector('article', timeout=60000)
-
-        df = await scrape_tweets(page, df, num_tweets=post_limit, latest_status_id=latest_post_id)
-
-        if not df.empty:
-            for index, row in df.iterrows():
-                post_data = {
-                    'post_id': row['status_id'],
-                    'text': row['text'],
-                    'datetime': row['datetime'],
-                    'image_urls': row['images'],
-                    'links': row['links'],
-                    'embed_links': row['embed_links']
-                }
-
-                collection.update_one(
-                    {'post_id': row['status_id']},
-                    {'$set': post_data},
-                    upsert=True
-                )
-                print(f"Saved post {row['status_id']} to MongoDB for {username}")
-
-                if row['images']:
-                    for img_url in row['images']:
-                        await download_image_to_mongodb(img_url, row['status_id'], username)
+        await rate_limiter.acquire(profile_link)
+        with metrics.stage('goto', username):
+            await page.goto(profile_link)
+        if '/login' in page.url:
+            # A logged-out session is sent to the login flow instead of the profile
+            raise RuntimeError(f"redirected to {page.url}, the session is logged out")
+        with metrics.stage('selector_wait', username):
+            await page.wait_for_selector('article', timeout=60000)
+
+        if interceptor:
+            tweets = await scrape_tweets_graphql(page, interceptor, tweets, num_tweets=post_limit, latest_status_id=latest_post_id, target=username)
+        else:
+            tweets = await scrape_tweets(page, tweets, num_tweets=post_limit, latest_status_id=latest_post_id, target=username)
+
+        for tweet in tweets.records():
+            post_data = {
+                'post_id': tweet['status_id'],
+                'text': tweet['text'],
+                'datetime': tweet['datetime'],
+                'image_urls': tweet['images'],
+                'video_urls': tweet['videos'],
+                'links': tweet['links'],
+                'embed_links': tweet['embed_links']
+            }
+
+            writer.upsert(post_data)
+
+            # Hand images to the media stage so downloads overlap with the next profile
+            for img_url in tweet['images'] or []:
+                if media_queue:
+                    media_queue.submit(img_url, tweet['status_id'], username)
+                else:
+                    await download_image_to_mongodb(img_url, tweet['status_id'], username)
 
     except Exception as e:
         print(f"Error scraping profile {profile_link}: {str(e)}")
+        metrics.error('profile', username)
+        failed = True
     finally:
-        if not page.is_closed():
+        # Flush whatever is still batched for this profile
+        try:
+            writer.flush()
+        except Exception as e:
+            print(f"Error saving posts for {username}: {str(e)}")
+        if interceptor:
+            interceptor.detach()
+        metrics.count(metrics.posts, username, writer.written)
+        resource_policy.report(page, username)
+        if owns_page and not page.is_closed():
             await page.close()
 
-async def scrape_profiles_concurrently(context: BrowserContext, profile_links: list, post_limit: int = 10, max_tasks: int = 4):
+    return None if failed else writer.written
+
+async def scrape_profiles_concurrently(context: BrowserContext, profile_links: list, post_limit: int = 10, max_tasks: int = 4, engine: str = 'dom', pool: ContextPool = None):
     semaphore = asyncio.Semaphore(max_tasks)
 
-    async def scrape_with_limit(profile):
-        async with semaphore:
-            await scrape_profile(context, profile, post_limit)
+    async with MediaFanout(download_image_to_mongodb) as media_queue:
+        async def scrape_with_limit(profile):
+            # With a pool every profile gets its own logged-in context
+            if pool:
+                async with pool.page() as page:
+                    return await scrape_profile(page.context, profile, post_limit, media_queue, engine, page=page)
+            async with semaphore:
+                return await scrape_profile(context, profile, post_limit, media_queue, engine)
 
-    tasks = [scrape_with_limit(profile) for profile in profile_links]
-    await asyncio.gather(*tasks)
+        tasks = [scrape_with_limit(profile) for profile in profile_links]
+        return await asyncio.gather(*tasks)
 
-async def login_to_x(username: str, password: str, browser) -> BrowserContext:
+async def login_to_x(username: str, password: str, browser, policy: ResourcePolicy = resource_policy, cookies_file: str = 'cookies.json') -> BrowserContext:
     context = await browser.new_context()
+    if policy:
+        await policy.apply(context)
     page = await context.new_page()
     
     # Load cookies if available
-    cookies_file = 'cookies.json'
     if os.path.exists(cookies_file):
         with open(cookies_file, 'r') as f:
             cookies = json.load(f)
@@ -249,22 +335,161 @@ async def login_to_x(username: str, password: str, browser) -> BrowserContext:
     
     return context
 
-async def main():
-    username = "@socialmedi51534"
-    password = "thisis_B0T"
-    profile_links = [
-        "https://x.com/elonmusk",
-        "https://x.com/billgates",
-        # Add more profiles as needed
-    ]
+async def launch_browser(p):
+    return await p.chromium.launch(headless=False)
+
+async def open_pool(browser, max_tasks: int = 4, account: Account = None) -> ContextPool:
+    # Given account (a shard's, verified by the parent) or the least recently used healthy one,
+    # then the pool of logged-in contexts from its cookies
+    account = account or session_manager.acquire()
+    context = await session_manager.open(browser, account, policy=resource_policy)
+    if not context:
+        return None
+    rate_limiter.account = account.username
+    await context.close()
+    pool = ContextPool(browser, size=max_tasks, cookies_file=account.session_file, policy=resource_policy)
+    await pool.start()
+    return pool
+
+async def scrape_cycle(pool: ContextPool, profile_links: list, post_limit: int = 10, max_tasks: int = 4, engine: str = 'dom', scheduler: PollScheduler = None) -> dict:
+    stats = {'profiles': len(profile_links)}
+    if scheduler:
+        # Only the profiles whose learned poll interval has elapsed, most active first
+        targets = {urlparse(link).path.strip('/'): link for link in profile_links}
+        profile_links = [targets[username] for username in scheduler.due(list(targets))]
+        stats['due'] = len(profile_links)
+
+    media_store.reset_stats()
+    rate_limiter.reset_stats()
+    results = await scrape_profiles_concurrently(None, profile_links, post_limit, max_tasks, engine, pool=pool)
+    if scheduler:
+        for link, written in zip(profile_links, results):
+            scheduler.record(urlparse(link).path.strip('/'), written or 0)
+
+    # Per-target outcome: the daemon rebuilds the session when every target fails
+    stats['succeeded'] = sum(written is not None for written in results)
+    stats['failed'] = len(results) - stats['succeeded']
+    stats['posts'] = sum(written or 0 for written in results)
+    stats['media'] = dict(media_store.report())
+    stats['rate_limiter'] = dict(rate_limiter.report())
+    return stats
+
+async def run_profiles(profile_links: list, post_limit: int = 10, max_tasks: int = 4, engine: str = 'dom', scheduler: PollScheduler = None, account: Account = None) -> dict:
+    started = time.monotonic()
 
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        context = await login_to_x(username, password, browser)
+        browser = await launch_browser(p)
+        pool = await open_pool(browser, max_tasks, account)
+        if pool:
+            stats = await scrape_cycle(pool, profile_links, post_limit, max_tasks, engine, scheduler)
+            await pool.close()
+        else:
+            stats = {'profiles': len(profile_links), 'posts': 0, 'error': 'login failed'}
+        await close_downloader()
+        media_store.close()
+        await browser.close()
+
+    stats['elapsed'] = round(time.monotonic() - started, 1)
+    return stats
+
+async def run_daemon(interval: float = CYCLE_INTERVAL, scheduler: PollScheduler = None, metrics_port: int = METRICS_PORT, metrics_file: str = METRICS_FILE):
+    # One warm browser and context pool, scraping PROFILE_LINKS (or the due ones) every interval seconds
+    async def run_cycle(pool):
+        stats = await scrape_cycle(pool, PROFILE_LINKS, engine=TIMELINE_ENGINE, scheduler=scheduler)
+        if metrics_file:
+            metrics.write(metrics_file)
+        return stats
+
+    daemon = ScrapeDaemon(
+        launch_browser=launch_browser,
+        open_session=open_pool,
+        run_cycle=run_cycle,
+        close_session=lambda pool: pool.close(),
+        interval=interval
+    )
+    if metrics_port:
+        metrics.serve(metrics_port)
+    try:
+        await daemon.run()
+    finally:
+        await close_downloader()
+        media_store.close()
+        metrics.close()
+
+async def ensure_session():
+    # Verify (or log in) once before the shards start and return the account's username (None on failure),
+    # so every worker opens that freshly verified session instead of acquiring another account
+    async with async_playwright() as p:
+        browser = await launch_browser(p)
+        account = session_manager.acquire()
+        context = await session_manager.open(browser, account)
         if context:
-            await scrape_profiles_concurrently(context, profile_links)
             await context.close()
         await browser.close()
+        return account.username if context else None
+
+def scrape_shard(profile_links: list, adaptive: bool = False, account: str = None) -> dict:
+    # Entry point of one sharded worker process; its metrics are merged by the parent.
+    # With adaptive the parent already picked the due profiles; the worker re-checks its share and records the polls
+    stats = asyncio.run(run_profiles(profile_links, engine=TIMELINE_ENGINE,
+                                     scheduler=poll_scheduler if adaptive else None,
+                                     account=session_manager.get(account) if account else None))
+    stats['metrics'] = metrics.snapshot()
+    return stats
+
+async def main(scheduler: PollScheduler = None, metrics_file: str = METRICS_FILE):
+    if scheduler and not scheduler.due([urlparse(link).path.strip('/') for link in PROFILE_LINKS]):
+        # Nothing due: skip the browser launch and login entirely
+        print("No profiles due yet")
+        return
+    await run_profiles(PROFILE_LINKS, engine=TIMELINE_ENGINE, scheduler=scheduler)
+    if metrics_file:
+        metrics.write(metrics_file)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', default='1',
+                        help="worker processes: a number, or 'auto' to size from cores and memory")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running with a warm browser instead of exiting after one run")
+    parser.add_argument('--interval', type=float, default=CYCLE_INTERVAL,
+                        help="seconds between daemon cycles")
+    parser.add_argument('--engine', choices=('dom', 'graphql'),
+                        help="read tweets from the rendered timeline (default) or its GraphQL responses")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="only scrape profiles that are due by their posting cadence, under a global hourly budget")
+    parser.add_argument('--metrics-file', default=METRICS_FILE,
+                        help="write Prometheus text metrics to this file after each run")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help="serve Prometheus metrics on this local port in daemon mode")
+    args = parser.parse_args()
+    if args.engine:
+        # Through the environment so sharded worker processes pick it up too
+        os.environ["TIMELINE_ENGINE"] = args.engine
+        TIMELINE_ENGINE = args.engine
+    scheduler = poll_scheduler if args.adaptive else None
+
+    if args.daemon:
+        asyncio.run(run_daemon(args.interval, scheduler, args.metrics_port, args.metrics_file))
+    elif args.shards == '1':
+        asyncio.run(main(scheduler, args.metrics_file))
+    else:
+        profile_links = PROFILE_LINKS
+        if scheduler:
+            # Due profiles are chosen once here, so the hourly budget is not applied per shard
+            targets = {urlparse(link).path.strip('/'): link for link in PROFILE_LINKS}
+            profile_links = [targets[username] for username in scheduler.due(list(targets))]
+        if not profile_links:
+            print("No profiles due yet")
+        else:
+            # Every shard opens the session verified here
+            account = asyncio.run(ensure_session())
+            if account:
+                shards = None if args.shards == 'auto' else int(args.shards)
+                results = run_sharded(functools.partial(scrape_shard, adaptive=bool(scheduler), account=account),
+                                      profile_links, shards)
+                print(f"Saved {sum(r.get('posts', 0) for r in results)} posts across {len(results)} shards")
+                if args.metrics_file:
+                    for result in results:
+                        metrics.merge(result.get('metrics'))
+                    metrics.write(args.metrics_file)
@@ -0,0 +1,3 @@
+# Benchmark-only helpers shared by X/benchmarks and Instagram/benchmarks.
+# Kept out of scraper_common/ and out of the images: nothing here is
+# imported by the scrapers themselves.
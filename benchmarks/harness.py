@@ -0,0 +1,143 @@
+# Shared pieces of the offline scrape benchmarks.
+# FixtureServer serves saved pages and generated media from 127.0.0.1, so
+# the scraping functions run through a real browser without live accounts.
+# PlaywrightCalls counts every message the Playwright client sends to its
+# driver (one per page/element API call), and peak RSS is read for this
+# process and for the browser processes it started.
+
+import collections
+import os
+import resource
+import struct
+import zlib
+
+from aiohttp import web
+import playwright._impl._connection as pw_connection
+
+# Huge budgets: the fixtures are local, only the scraper's own work is timed
+UNPACED_LIMIT = (1e9, 1 << 30)
+
+
+def png_bytes(width: int = 64, height: int = 64, seed: int = 0) -> bytes:
+    """A valid RGB PNG, so <img> elements decode and downloads pass size checks"""
+    rows = b''.join(b'\x00' + bytes((x * 7 + y * 13 + seed) % 256 for x in range(width * 3))
+                    for y in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+class FixtureServer:
+    """aiohttp app on a free local port; handlers are added with route()"""
+
+    def __init__(self):
+        self.app = web.Application()
+        self.requests = 0
+        self.port = None
+        self._runner = None
+
+    def route(self, path: str, handler):
+        async def counted(request):
+            self.requests += 1
+            return await handler(request)
+        self.app.router.add_get(path, counted)
+
+    def url(self, path: str = '/') -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def close(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class PlaywrightCalls:
+    """Counts protocol messages sent to the Playwright driver while active"""
+
+    def __init__(self):
+        self.total = 0
+        self.methods = collections.Counter()
+        self._original = None
+
+    def __enter__(self):
+        original = self._original = pw_connection.Connection._send_message_to_server
+        calls = self
+
+        def counted(connection, object, method, *args, **kwargs):
+            calls.total += 1
+            calls.methods[method] += 1
+            return original(connection, object, method, *args, **kwargs)
+
+        pw_connection.Connection._send_message_to_server = counted
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pw_connection.Connection._send_message_to_server = self._original
+
+    def reset(self):
+        self.total = 0
+        self.methods.clear()
+
+
+def disable_pacing(rate_limiter):
+    """Lift the scraper's token buckets for local fixture hosts"""
+    rate_limiter.account_limit = rate_limiter.host_limit = rate_limiter.cdn_limit = UNPACED_LIMIT
+    rate_limiter._buckets.clear()
+
+
+def _descendants(root: int) -> list:
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, the fields after ')' do not
+                parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    found, frontier = [], [root]
+    while frontier:
+        children = [pid for pid, parent in parents.items() if parent in frontier]
+        found.extend(children)
+        frontier = children
+    return found
+
+
+def browser_peak_rss() -> int:
+    """Sum of the peak RSS (VmHWM) of every process started below this one, in bytes; 0 without /proc"""
+    if not os.path.isdir('/proc'):
+        return 0
+    total = 0
+    for pid in _descendants(os.getpid()):
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+def python_peak_rss() -> int:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def report(name: str, items: int, elapsed: float, calls: PlaywrightCalls, browser_rss: int, top: int = 0):
+    print(f"{name:<20} {items:>5} items in {elapsed:6.2f}s  {items / elapsed if elapsed else 0:8.1f} items/s  "
+          f"{calls.total / max(items, 1):6.1f} Playwright calls/item  "
+          f"peak RSS python {python_peak_rss() / 1024 / 1024:.0f} MB, browser {browser_rss / 1024 / 1024:.0f} MB")
+    for method, count in calls.methods.most_common(top):
+        print(f"{'':<22}{method:<28} {count / max(items, 1):6.2f}/item")
@@ -0,0 +1,4 @@
+# Helpers shared by the X and Instagram scrapers.
+# Both images copy this package next to their entry scripts (see the
+# Dockerfiles); from a checkout the scripts add the repository root to
+# sys.path, so X/ and Instagram/ import the same modules without copies.
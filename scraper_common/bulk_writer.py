@@ -0,0 +1,100 @@
+# Batched upserts for scraped documents.
+# Instead of one update_one round trip per post, upserts are collected and
+# sent with a single unordered bulk_write when the batch is full, when the
+# flush interval has passed, or when the writer is closed. An optional
+# Watermark is advanced after every flush, never past a document that failed.
+# A batch that could not be sent at all (connection or timeout errors) stays
+# pending and is retried by the next flush.
+
+import time
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from scraper_common.metrics import get_metrics
+from scraper_common.watermarks import parse_datetime
+
+BATCH_SIZE = 100
+FLUSH_INTERVAL = 5.0  # seconds
+
+
+class BulkUpserter:
+    """Collects {'$set': doc} upserts keyed by one field and flushes them in bulk"""
+
+    def __init__(self, collection, key: str = 'post_id', batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, watermark=None, target: str = None):
+        self.collection = collection
+        # Label for the db_write latency metric, the collection name unless given
+        self.target = target or collection.name
+        self.watermark = watermark
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        # Pending $set documents by key, so repeated writes of the same
+        # document collapse into a single operation
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def upsert(self, doc: dict):
+        """Queue an upsert of doc, flushing if the batch is full or stale"""
+        key_value = doc[self.key]
+        if key_value in self._pending:
+            self._pending[key_value].update(doc)
+        else:
+            self._pending[key_value] = dict(doc)
+
+        if (len(self._pending) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def operations(self) -> list:
+        return [UpdateOne({self.key: key_value}, {'$set': doc}, upsert=True)
+                for key_value, doc in self._pending.items()]
+
+    def _written_before_failures(self, docs: list, failed: set) -> list:
+        """Written docs the watermark may move over: none as new as a failed one, or the next run's
+        incremental stop would skip the posts that were never written"""
+        written = [doc for index, doc in enumerate(docs) if index not in failed]
+        failed_dates = [parse_datetime(docs[index].get('datetime')) for index in failed if index < len(docs)]
+        if not failed_dates:
+            return written
+        if None in failed_dates:
+            return []  # A failed post of unknown date could be the newest
+        oldest = min(failed_dates)
+        return [doc for doc in written if (parse_datetime(doc.get('datetime')) or oldest) < oldest]
+
+    def flush(self) -> int:
+        """Send all pending upserts with one unordered bulk_write"""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return 0
+
+        operations = self.operations()
+        docs = list(self._pending.values())
+        try:
+            with get_metrics().stage('db_write', self.target):
+                result = self.collection.bulk_write(operations, ordered=False)
+            count = result.upserted_count + result.matched_count
+        except BulkWriteError as e:
+            # Unordered: everything except the failed operations was applied
+            errors = e.details.get('writeErrors', [])
+            print(f"Bulk write to {self.collection.name} had {len(errors)} errors: {errors[:3]}")
+            count = len(operations) - len(errors)
+            docs = self._written_before_failures(docs, {error['index'] for error in errors})
+        # Any other error leaves the batch pending, so the next flush or close retries it.
+        # Cleared only here: the server answered, and whatever it rejected is not retried
+        self._pending = {}
+
+        self.written += count
+        if self.watermark is not None:
+            self.watermark.advance(docs)
+        print(f"Saved {count} documents to MongoDB collection {self.collection.name}")
+        return count
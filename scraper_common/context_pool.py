@@ -0,0 +1,126 @@
+# Pool of logged-in browser contexts for concurrent profile scraping.
+# Each context is built from the saved session (a storage_state file or a
+# cookies JSON list) and handed out to one profile at a time together with
+# a reused page, so storage, cookies and throttling are not shared by every
+# concurrent task. A context is recycled after a configurable number of
+# main-frame navigations; a slot whose replacement cannot be opened stays
+# in the pool and is retried by its next borrower, so the pool never shrinks.
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+POOL_SIZE = 4
+MAX_NAVIGATIONS = 50
+RECYCLE_ATTEMPTS = 3
+
+
+class _Slot:
+    __slots__ = ('context', 'page', 'navigations')
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.navigations = 0
+
+
+class ContextPool:
+    """N logged-in contexts, each lent out with its page to one task at a time"""
+
+    def __init__(self, browser, size: int = POOL_SIZE, storage_state: str = None, cookies_file: str = None,
+                 max_navigations: int = MAX_NAVIGATIONS, policy=None, **context_options):
+        self.browser = browser
+        self.size = size
+        self.storage_state = storage_state
+        self.cookies_file = cookies_file
+        self.max_navigations = max_navigations
+        self.policy = policy
+        self.context_options = context_options
+        self.recycled = 0
+        self._slots = asyncio.Queue()
+        self._all = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _new_slot(self) -> _Slot:
+        options = dict(self.context_options)
+        if self.storage_state and os.path.exists(self.storage_state):
+            options['storage_state'] = self.storage_state
+        context = await self.browser.new_context(**options)
+        try:
+            if self.cookies_file and os.path.exists(self.cookies_file):
+                with open(self.cookies_file, 'r') as f:
+                    await context.add_cookies(json.load(f))
+            if self.policy:
+                await self.policy.apply(context)
+            page = await context.new_page()
+        except Exception:
+            await context.close()
+            raise
+        slot = _Slot(context, page)
+
+        def count_navigation(frame):
+            if frame == page.main_frame:
+                slot.navigations += 1
+        page.on("framenavigated", count_navigation)
+
+        self._all.append(slot)
+        return slot
+
+    async def start(self):
+        for _ in range(self.size):
+            self._slots.put_nowait(await self._new_slot())
+        print(f"Context pool ready with {self.size} contexts")
+
+    async def _recycle(self, slot: _Slot) -> _Slot:
+        """Open a replacement for slot, then close it; if no context can be opened slot is left untouched"""
+        for attempt in range(1, RECYCLE_ATTEMPTS + 1):
+            try:
+                fresh = await self._new_slot()
+                break
+            except Exception as e:
+                if attempt == RECYCLE_ATTEMPTS:
+                    raise
+                print(f"Could not open a pooled context (attempt {attempt}/{RECYCLE_ATTEMPTS}): {e}")
+                await asyncio.sleep(attempt)
+
+        self._all.remove(slot)
+        try:
+            await slot.context.close()
+        except Exception as e:
+            print(f"Warning when closing pooled context: {e}")
+        self.recycled += 1
+        return fresh
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a context's page for one profile"""
+        slot = await self._slots.get()
+        try:
+            # A page closed by the borrower is replaced with a fresh one
+            if slot.page.is_closed():
+                slot = await self._recycle(slot)
+            yield slot.page
+        finally:
+            if slot.page.is_closed() or slot.navigations >= self.max_navigations:
+                try:
+                    slot = await self._recycle(slot)
+                except Exception as e:
+                    print(f"Could not recycle pooled context, its next borrower retries: {e}")
+            # Always returned, a failed recycle must not shrink the pool
+            self._slots.put_nowait(slot)
+
+    async def close(self):
+        for slot in self._all:
+            try:
+                await slot.context.close()
+            except Exception as e:
+                print(f"Warning when closing pooled context: {e}")
+        self._all = []
+        self._slots = asyncio.Queue()
@@ -0,0 +1,126 @@
+# Long-running scheduler daemon.
+# Keeps one warm Playwright driver, browser and logged-in session across
+# scrape cycles instead of paying interpreter start, imports, Chromium
+# launch and login verification on every cron run. The browser is only
+# relaunched when it disconnects, and the session is only rebuilt (with a
+# fresh login check) after consecutive cycle failures. A cycle fails when
+# run_cycle raises or when every target it attempted failed: the scrapers
+# catch per-target errors, so an expired session otherwise shows up only
+# as cycles that save nothing.
+
+import asyncio
+import signal
+import time
+from playwright.async_api import async_playwright
+
+CYCLE_INTERVAL = 2 * 60 * 60  # seconds, same cadence as the crontab
+MAX_CYCLE_FAILURES = 2
+
+
+class ScrapeDaemon:
+    """Runs run_cycle(session) on a timer with a browser and session kept warm.
+
+    launch_browser(playwright) -> browser, open_session(browser) -> session or
+    None, run_cycle(session) -> stats dict and close_session(session) are the
+    platform hooks. The stats dict reports per-target outcomes as 'succeeded'
+    and 'failed' counts.
+    """
+
+    def __init__(self, launch_browser, open_session, run_cycle, close_session,
+                 interval: float = CYCLE_INTERVAL, max_cycle_failures: int = MAX_CYCLE_FAILURES):
+        self.launch_browser = launch_browser
+        self.open_session = open_session
+        self.run_cycle = run_cycle
+        self.close_session = close_session
+        self.interval = interval
+        self.max_cycle_failures = max_cycle_failures
+        self.browser = None
+        self.session = None
+        self.cycles = 0
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _ensure_session(self, playwright) -> float:
+        """Relaunch the browser / rebuild the session only if needed, return the seconds spent"""
+        started = time.monotonic()
+        if self.browser is None or not self.browser.is_connected():
+            if self.browser is not None:
+                print("Browser disconnected, relaunching")
+            self.session = None
+            self.browser = await self.launch_browser(playwright)
+        if self.session is None:
+            self.session = await self.open_session(self.browser)
+        return time.monotonic() - started
+
+    async def _drop_session(self):
+        if self.session is not None:
+            try:
+                await self.close_session(self.session)
+            except Exception as e:
+                print(f"Error closing session: {e}")
+        self.session = None
+
+    async def _sleep_until(self, deadline: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        daemon_started = time.monotonic()
+        failures = 0
+
+        # docker stop / Ctrl-C finish the current wait instead of killing a cycle mid-write
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass
+
+        async with async_playwright() as playwright:
+            try:
+                while not self._stopping.is_set():
+                    cycle_started = time.monotonic()
+                    try:
+                        setup_time = await self._ensure_session(playwright)
+                    except Exception as e:
+                        print(f"Could not start browser session: {e}")
+                        await self._drop_session()
+                        await self._sleep_until(cycle_started + min(self.interval, 300))
+                        continue
+                    if self.session is None:
+                        print("Login failed, retrying next cycle")
+                        await self._sleep_until(cycle_started + self.interval)
+                        continue
+
+                    if self.cycles == 0:
+                        print(f"Daemon warm: first cycle starts {time.monotonic() - daemon_started:.1f}s after start")
+
+                    try:
+                        stats = await self.run_cycle(self.session)
+                        cycle_failed = stats.get('failed', 0) > 0 and not stats.get('succeeded', 0)
+                    except Exception as e:
+                        stats = {'error': str(e)}
+                        cycle_failed = True
+
+                    if cycle_failed:
+                        failures += 1
+                        # Only a repeatedly failing session gets a new login check
+                        if failures >= self.max_cycle_failures:
+                            print(f"{failures} failed cycles in a row, rebuilding the session")
+                            await self._drop_session()
+                            failures = 0
+                    else:
+                        failures = 0
+
+                    self.cycles += 1
+                    print(f"Cycle {self.cycles} done in {time.monotonic() - cycle_started:.1f}s "
+                          f"(setup {setup_time:.2f}s): {stats}")
+                    await self._sleep_until(cycle_started + self.interval)
+            finally:
+                await self._drop_session()
+                if self.browser is not None and self.browser.is_connected():
+                    await self.browser.close()
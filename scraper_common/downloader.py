@@ -0,0 +1,158 @@
+# Process-wide media downloader.
+# All media downloads share one aiohttp.ClientSession so connections to the
+# CDN are pooled and kept alive instead of paying a TCP + TLS handshake for
+# every file.
+#
+# stream() writes the body to any object with an async write() (an aiofiles
+# file, a GridFS upload stream) in fixed-size chunks, so memory per download
+# stays at one chunk. The received length is checked against the announced
+# size, and a retry after a partial failure resumes with an HTTP Range
+# request instead of starting over.
+
+import asyncio
+import aiohttp
+from scraper_common.rate_limiter import get_rate_limiter
+
+# Connection pool defaults, tuned for a handful of CDN hosts
+MAX_CONNECTIONS = 64
+MAX_CONNECTIONS_PER_HOST = 8
+KEEPALIVE_TIMEOUT = 60  # seconds an idle connection stays open
+DNS_CACHE_TTL = 300  # seconds
+REQUEST_TIMEOUT = 30  # seconds
+STREAM_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_ATTEMPTS = 3
+
+
+class DownloadError(Exception):
+    """A download that cannot succeed by retrying"""
+
+
+class IncompleteDownload(DownloadError):
+    """The body ended before the announced length, retried with Range"""
+
+
+def _range_start(content_range: str) -> int:
+    # "bytes 1000-1999/5000" -> 1000
+    if not content_range or not content_range.startswith('bytes '):
+        raise DownloadError(f"Unusable Content-Range {content_range!r}")
+    return int(content_range[len('bytes '):].split('-')[0])
+
+
+def _range_total(content_range: str):
+    total = content_range.rpartition('/')[2] if content_range else ''
+    return int(total) if total.isdigit() else None
+
+
+class MediaDownloader:
+    """Holds one connection-pooled ClientSession for the whole process"""
+
+    def __init__(self, limit: int = MAX_CONNECTIONS, limit_per_host: int = MAX_CONNECTIONS_PER_HOST,
+                 keepalive_timeout: float = KEEPALIVE_TIMEOUT, dns_ttl: int = DNS_CACHE_TTL,
+                 timeout: float = REQUEST_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self.timeout = timeout
+        self._session = None
+        self._loop = None
+
+    def session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use in the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._loop = loop
+        return self._session
+
+    def get(self, url: str, **kwargs):
+        """Same as ClientSession.get, but on the pooled session"""
+        return self.session().get(url, **kwargs)
+
+    async def stream(self, url: str, sink, headers: dict = None, attempts: int = DOWNLOAD_ATTEMPTS,
+                     chunk_size: int = STREAM_CHUNK_SIZE, min_size: int = 0) -> int:
+        """Write url's body into sink chunk by chunk, resuming with Range on retries; returns the length"""
+        received = 0
+        total = None
+        last_error = None
+        for attempt in range(attempts):
+            # Identity encoding so the announced length is the length we receive
+            request_headers = dict(headers or {}, **{'Accept-Encoding': 'identity'})
+            if received:
+                request_headers['Range'] = f'bytes={received}-'
+            try:
+                # Every attempt is a request against the CDN host's budget
+                await get_rate_limiter().acquire(url, per_account=False)
+                timeout = aiohttp.ClientTimeout(total=self.timeout * (attempt + 1))
+                async with self.get(url, headers=request_headers, timeout=timeout) as response:
+                    response.raise_for_status()
+                    if response.status == 206:
+                        content_range = response.headers.get('Content-Range')
+                        skip = received - _range_start(content_range)
+                        total = _range_total(content_range) or total
+                        if skip < 0:
+                            raise DownloadError(f"Server resumed past byte {received}")
+                    elif response.status == 200:
+                        # Range ignored: the body starts over, drop what the sink already has
+                        skip = received
+                        total = response.content_length
+                    else:
+                        raise DownloadError(f"Unexpected HTTP {response.status}")
+
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        if skip:
+                            dropped = min(skip, len(chunk))
+                            chunk = chunk[dropped:]
+                            skip -= dropped
+                            if not chunk:
+                                continue
+                        await sink.write(chunk)
+                        received += len(chunk)
+
+                if total is not None and received != total:
+                    raise IncompleteDownload(f"Got {received} of {total} bytes")
+                if received < min_size:
+                    raise DownloadError(f"Response too small ({received} bytes), likely an error")
+                return received
+            except IncompleteDownload as e:
+                last_error = e
+            except DownloadError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+            print(f"Download attempt {attempt + 1} stopped at {received} bytes: {last_error!r}")
+            await asyncio.sleep(1)
+        raise IncompleteDownload(f"Gave up on {url[:80]} after {attempts} attempts at {received} bytes") from last_error
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+_downloader = None
+
+
+def get_downloader() -> MediaDownloader:
+    """Return the process-wide MediaDownloader"""
+    global _downloader
+    if _downloader is None:
+        _downloader = MediaDownloader()
+    return _downloader
+
+
+async def close_downloader():
+    """Close the shared session, call once when the scraper finishes"""
+    if _downloader is not None:
+        await _downloader.close()
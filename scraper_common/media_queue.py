@@ -0,0 +1,76 @@
+# Per-run media download stage.
+# Scrapers submit media URLs to a queue and keep browsing; a fixed pool of
+# workers drains it concurrently. The worker count is the global download
+# limit and a semaphore per host keeps any single CDN from being hammered.
+# A handler reports a failure by raising or, if it handles its own errors,
+# by returning False.
+
+import asyncio
+from urllib.parse import urlparse
+
+MEDIA_WORKERS = 8
+MEDIA_PER_HOST = 4
+
+
+class MediaFanout:
+    """Bounded worker pool running handler(url, *args) for each submitted URL"""
+
+    def __init__(self, handler, workers: int = MEDIA_WORKERS, per_host: int = MEDIA_PER_HOST):
+        self.handler = handler
+        self.workers = workers
+        self.per_host = per_host
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self._queue = None
+        self._tasks = []
+        self._host_limits = {}
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, url: str, *args):
+        """Queue a download without waiting for it"""
+        self.submitted += 1
+        self._queue.put_nowait((url, args))
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def _worker(self):
+        while True:
+            url, args = await self._queue.get()
+            try:
+                async with self._host_limit(url):
+                    result = await self.handler(url, *args)
+                if result is False:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Media download failed for {url}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def close(self):
+        """Wait for every queued download, then stop the workers"""
+        if self._queue is None:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        print(f"Media downloads finished: {self.completed} done, {self.failed} failed of {self.submitted}")
@@ -0,0 +1,225 @@
+# Non-blocking GridFS media storage for the asyncio scrapers.
+# Uploads go through Motor, so writing an image to GridFS no longer freezes
+# the event loop and stalls the other profile tasks. Files keep the same
+# top-level fields (filename, post_id, target, platform) that the legacy
+# gridfs.GridFS.put calls wrote.
+#
+# Media is content-addressed: every GridFS file carries the SHA-256 of its
+# bytes and is stored once. media_urls maps a source URL to its hash so a
+# known URL is never downloaded again, and media_refs links each post to
+# the blob it uses. A deduplicated file keeps the target and post_id of
+# its first upload, so listing a target's media has to go through
+# media_refs as well (see db_scripts/db_list_target_image.py).
+# download_deduplicated() streams a URL straight into a GridFS upload
+# while hashing it, so no download is held in memory.
+
+import asyncio
+import datetime
+import hashlib
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket, AsyncIOMotorGridIn
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from scraper_common.downloader import get_downloader
+from scraper_common.metrics import get_metrics
+
+MONGO_URI = 'mongodb://localhost:27017'
+CHUNK_SIZE = 255 * 1024  # GridFS default chunk size
+MEDIA_URLS_COLLECTION = 'media_urls'
+MEDIA_REFS_COLLECTION = 'media_refs'
+
+
+class _HashingSink:
+    """Passes downloaded chunks to a GridFS upload stream while hashing them"""
+
+    def __init__(self, grid_in: AsyncIOMotorGridIn):
+        self.grid_in = grid_in
+        self.sha256 = hashlib.sha256()
+
+    async def write(self, chunk: bytes):
+        self.sha256.update(chunk)
+        await self.grid_in.write(chunk)
+
+
+class MediaStore:
+    """Async, content-addressed GridFS store bound to one database"""
+
+    def __init__(self, db_name: str, uri: str = MONGO_URI, bucket_name: str = 'fs',
+                 chunk_size: int = CHUNK_SIZE):
+        self.db_name = db_name
+        self.uri = uri
+        self.bucket_name = bucket_name
+        self.chunk_size = chunk_size
+        self._client = None
+        self._loop = None
+        self._indexes_ready = False
+        self._hash_locks = {}
+        self.reset_stats()
+
+    @property
+    def db(self):
+        """Motor database handle, created on first use in the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._client.close()
+            self._client = AsyncIOMotorClient(self.uri)
+            self._loop = loop
+            self._indexes_ready = False
+        return self._client[self.db_name]
+
+    @property
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        return AsyncIOMotorGridFSBucket(self.db, bucket_name=self.bucket_name,
+                                        chunk_size_bytes=self.chunk_size)
+
+    @property
+    def files(self):
+        return self.db[f'{self.bucket_name}.files']
+
+    def open_upload(self, filename: str, **fields) -> AsyncIOMotorGridIn:
+        """Open a GridFS upload stream, extra fields are stored on the file document"""
+        return AsyncIOMotorGridIn(self.db[self.bucket_name], filename=filename,
+                                  chunkSize=self.chunk_size, **fields)
+
+    async def put(self, data: bytes, filename: str, **fields):
+        """Store data in GridFS chunk by chunk and return the file id"""
+        grid_in = self.open_upload(filename, **fields)
+        try:
+            for offset in range(0, len(data), self.chunk_size):
+                await grid_in.write(data[offset:offset + self.chunk_size])
+        except Exception:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        return grid_in._id
+
+    # ---------------- content-addressed storage ----------------
+
+    def reset_stats(self):
+        self.stats = {'urls_skipped': 0, 'blobs_stored': 0, 'blobs_deduplicated': 0,
+                      'bytes_stored': 0, 'bytes_saved': 0}
+
+    async def ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        await self.files.create_index([('sha256', ASCENDING)], unique=True, name='sha256_unique',
+                                      partialFilterExpression={'sha256': {'$type': 'string'}})
+        await self.db[MEDIA_REFS_COLLECTION].create_index(
+            [('target', ASCENDING), ('post_id', ASCENDING), ('sha256', ASCENDING)],
+            unique=True, name='post_blob_unique')
+        await self.db[MEDIA_REFS_COLLECTION].create_index([('sha256', ASCENDING)], name='sha256')
+        self._indexes_ready = True
+
+    async def _add_reference(self, sha256: str, url: str, post_id, target: str, platform: str):
+        await self.db[MEDIA_REFS_COLLECTION].update_one(
+            {'target': target, 'post_id': post_id, 'sha256': sha256},
+            {'$setOnInsert': {'url': url, 'platform': platform,
+                              'created_at': datetime.datetime.now(datetime.timezone.utc)}},
+            upsert=True
+        )
+
+    async def _remember_url(self, url: str, sha256: str, file_id, length: int):
+        await self.db[MEDIA_URLS_COLLECTION].update_one(
+            {'_id': url},
+            {'$set': {'sha256': sha256, 'file_id': file_id, 'length': length}},
+            upsert=True
+        )
+
+    async def link_known_url(self, url: str, post_id, target: str, platform: str) -> bool:
+        """If url was stored before, link it to this post and return True (no download needed)"""
+        await self.ensure_indexes()
+        known = await self.db[MEDIA_URLS_COLLECTION].find_one({'_id': url})
+        if not known:
+            return False
+        await self._add_reference(known['sha256'], url, post_id, target, platform)
+        self.stats['urls_skipped'] += 1
+        self.stats['bytes_saved'] += known.get('length', 0)
+        return True
+
+    async def put_deduplicated(self, data: bytes, url: str, filename: str, post_id, target: str,
+                               platform: str, **fields):
+        """Store data once per SHA-256, record the URL and the post reference, return the file id"""
+        await self.ensure_indexes()
+        sha256 = hashlib.sha256(data).hexdigest()
+
+        # Serialise uploads of the same content within this process
+        lock = self._hash_locks.setdefault(sha256, asyncio.Lock())
+        async with lock:
+            existing = await self.files.find_one({'sha256': sha256}, {'_id': 1})
+            if existing:
+                file_id = existing['_id']
+                self.stats['blobs_deduplicated'] += 1
+                self.stats['bytes_saved'] += len(data)
+            else:
+                try:
+                    file_id = await self.put(data, filename=filename, sha256=sha256, post_id=post_id,
+                                             target=target, platform=platform, **fields)
+                    self.stats['blobs_stored'] += 1
+                    self.stats['bytes_stored'] += len(data)
+                except DuplicateKeyError:
+                    # Another process stored the same bytes first
+                    existing = await self.files.find_one({'sha256': sha256}, {'_id': 1})
+                    file_id = existing['_id']
+                    self.stats['blobs_deduplicated'] += 1
+                    self.stats['bytes_saved'] += len(data)
+        self._hash_locks.pop(sha256, None)
+
+        metrics = get_metrics()
+        metrics.count(metrics.media_bytes, target, len(data))
+        await self._remember_url(url, sha256, file_id, len(data))
+        await self._add_reference(sha256, url, post_id, target, platform)
+        return file_id
+
+    async def download_deduplicated(self, url: str, filename: str, post_id, target: str, platform: str,
+                                    downloader=None, **fields):
+        """Stream url into GridFS chunk by chunk; if the bytes turn out to be stored already, keep the old blob"""
+        await self.ensure_indexes()
+        grid_in = self.open_upload(filename, post_id=post_id, target=target, platform=platform, **fields)
+        sink = _HashingSink(grid_in)
+        try:
+            length = await (downloader or get_downloader()).stream(url, sink)
+            sha256 = sink.sha256.hexdigest()
+            existing = await self.files.find_one({'sha256': sha256}, {'_id': 1})
+            if existing is None:
+                await grid_in.set('sha256', sha256)
+                await grid_in.close()
+        except DuplicateKeyError:
+            # Another writer stored the same bytes between the lookup and the close
+            existing = await self.files.find_one({'sha256': sha256}, {'_id': 1})
+        except BaseException:
+            await grid_in.abort()
+            raise
+
+        if existing:
+            # Drop the chunks this download wrote, the content is already stored
+            await grid_in.abort()
+            file_id = existing['_id']
+            self.stats['blobs_deduplicated'] += 1
+            self.stats['bytes_saved'] += length
+        else:
+            file_id = grid_in._id
+            self.stats['blobs_stored'] += 1
+            self.stats['bytes_stored'] += length
+
+        metrics = get_metrics()
+        metrics.count(metrics.media_bytes, target, length)
+        await self._remember_url(url, sha256, file_id, length)
+        await self._add_reference(sha256, url, post_id, target, platform)
+        return file_id
+
+    def report(self):
+        """Print dedup ratio and bytes saved since the last reset_stats()"""
+        stats = self.stats
+        total = stats['urls_skipped'] + stats['blobs_stored'] + stats['blobs_deduplicated']
+        ratio = (stats['urls_skipped'] + stats['blobs_deduplicated']) / total if total else 0.0
+        print(f"Media dedup: {total} media, {stats['blobs_stored']} new blobs, "
+              f"{stats['blobs_deduplicated']} duplicate blobs, {stats['urls_skipped']} known URLs skipped, "
+              f"dedup ratio {ratio:.1%}, {stats['bytes_saved'] / 1024 / 1024:.1f} MB saved, "
+              f"{stats['bytes_stored'] / 1024 / 1024:.1f} MB stored")
+        return stats
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+        self._client = None
+        self._loop = None
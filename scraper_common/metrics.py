@@ -0,0 +1,228 @@
+# Prometheus-style metrics for the scrape stages.
+# The only record of a run used to be print output in /var/log/cron.log, so
+# there was no way to tell whether time went into page loads, selector
+# waits, extraction, scrolling, downloads or database writes. Each of those
+# stages is now timed into a latency histogram labelled by target, and
+# posts, stories, media bytes and errors are counted per target. The
+# registry is rendered in the Prometheus text format, either served from a
+# small local HTTP server (daemon mode) or written to a file at the end of a
+# cron run, e.g. for node_exporter's textfile collector.
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NAMESPACE = 'scraper'
+# Seconds; page loads and selector waits run up to a minute
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+    def snapshot(self) -> dict:
+        return dict(self.values)
+
+    def merge(self, values: dict):
+        for key, value in values.items():
+            self.values[key] = self.values.get(key, 0) + value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.values = {}    # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for key, series in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(round(series[-2], 6))}"
+            yield f"{self.name}_count{labels} {series[-1]}"
+
+    def snapshot(self) -> dict:
+        return {key: list(series) for key, series in self.values.items()}
+
+    def merge(self, values: dict):
+        for key, series in values.items():
+            current = self.values.get(key)
+            self.values[key] = [a + b for a, b in zip(current, series)] if current else list(series)
+
+
+class MetricsRegistry:
+    """The scraper's counters and stage histograms, rendered in the Prometheus text format"""
+
+    def __init__(self, namespace: str = NAMESPACE):
+        self.namespace = namespace
+        self._metrics = {}
+        # The HTTP server thread renders while the event loop records
+        self._lock = threading.Lock()
+        self._server = None
+
+        self.stage_seconds = self.histogram('stage_seconds', 'Latency of one scrape stage', ('stage', 'target'))
+        self.posts = self.counter('posts_total', 'Posts scraped and written', ('target',))
+        self.stories = self.counter('stories_total', 'Stories scraped', ('target',))
+        self.media_bytes = self.counter('media_bytes_total', 'Media bytes downloaded or captured', ('target',))
+        self.errors = self.counter('errors_total', 'Failed scrape stages', ('stage', 'target'))
+
+    def _add(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._add(Counter(f"{self.namespace}_{name}", help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = STAGE_BUCKETS) -> Histogram:
+        return self._add(Histogram(f"{self.namespace}_{name}", help, labelnames, buckets))
+
+    # ---------------- recording ----------------
+
+    @contextmanager
+    def stage(self, stage: str, target: str = ''):
+        """Time the block as one stage for target; an exception is also counted as an error"""
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.error(stage, target)
+            raise
+        finally:
+            with self._lock:
+                self.stage_seconds.observe(time.monotonic() - started, stage=stage, target=target)
+
+    def count(self, counter: Counter, target: str = '', amount: float = 1):
+        if amount:
+            with self._lock:
+                counter.inc(amount, target=target)
+
+    def error(self, stage: str, target: str = ''):
+        with self._lock:
+            self.errors.inc(stage=stage, target=target)
+
+    # ---------------- export ----------------
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for metric in self._metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.samples())
+        lines.append(f"# TYPE {self.namespace}_last_run_timestamp_seconds gauge")
+        lines.append(f"{self.namespace}_last_run_timestamp_seconds {int(time.time())}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> dict:
+        """Picklable copy of every series, for merging the registries of sharded workers"""
+        with self._lock:
+            return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def merge(self, snapshot: dict):
+        with self._lock:
+            for name, values in (snapshot or {}).items():
+                if name in self._metrics:
+                    self._metrics[name].merge(values)
+
+    def write(self, path: str):
+        """Write the text format to path atomically, so a collector never reads half a file"""
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_file, path)
+        print(f"Metrics written to {path}")
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+        """Serve /metrics from a background thread until close()"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the cron log
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True).start()
+        print(f"Serving metrics on http://{host}:{port}/metrics")
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        self._server = None
+
+
+_metrics = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide MetricsRegistry"""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
@@ -0,0 +1,91 @@
+# Request-routing filter for browser contexts.
+# Blocks requests the scrapers never need (fonts, analytics, video previews,
+# third-party scripts) by resource type, URL pattern or host, and keeps a
+# per-page count of what was blocked.
+
+import re
+from urllib.parse import urlparse
+
+# Rough transfer sizes per resource type, used to estimate the bytes saved
+# by a blocked request (its real size is never known, it is not fetched)
+ESTIMATED_BYTES = {
+    'font': 40 * 1024,
+    'media': 400 * 1024,
+    'image': 30 * 1024,
+    'script': 60 * 1024,
+    'stylesheet': 20 * 1024,
+    'xhr': 5 * 1024,
+    'fetch': 5 * 1024,
+    'other': 5 * 1024,
+}
+
+DEFAULT_BLOCKED_TYPES = ('font',)
+DEFAULT_BLOCKED_HOSTS = (
+    'www.google-analytics.com',
+    'www.googletagmanager.com',
+    'connect.facebook.net',
+    'static.ads-twitter.com',
+    'ads-api.twitter.com',
+    'analytics.twitter.com',
+)
+DEFAULT_BLOCKED_PATTERNS = (
+    r'/(log|scribe|jot)(/|\?|$)',
+    r'/client_event\.json',
+    r'/logging_client_events',
+)
+
+
+def _host_matches(host: str, hosts) -> bool:
+    return any(host == h or host.endswith('.' + h) for h in hosts)
+
+
+class ResourcePolicy:
+    """Context route handler that aborts requests matching a type, URL pattern or host"""
+
+    def __init__(self, block_types=DEFAULT_BLOCKED_TYPES, block_patterns=DEFAULT_BLOCKED_PATTERNS,
+                 block_hosts=DEFAULT_BLOCKED_HOSTS, allow_patterns=(), first_party_hosts=()):
+        self.block_types = set(block_types)
+        # When set, scripts from any other host are treated as third-party and blocked
+        self.first_party_hosts = tuple(first_party_hosts)
+        self.block_patterns = [re.compile(p) for p in block_patterns]
+        self.block_hosts = set(block_hosts)
+        self.allow_patterns = [re.compile(p) for p in allow_patterns]
+        self._page_stats = {}
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if any(p.search(url) for p in self.allow_patterns):
+            return False
+        if resource_type in self.block_types:
+            return True
+        host = urlparse(url).hostname or ''
+        if _host_matches(host, self.block_hosts):
+            return True
+        if (resource_type == 'script' and self.first_party_hosts
+                and not _host_matches(host, self.first_party_hosts)):
+            return True
+        return any(p.search(url) for p in self.block_patterns)
+
+    async def apply(self, context):
+        """Install the policy on every page of the context"""
+        await context.route('**/*', self._handle)
+
+    async def _handle(self, route):
+        request = route.request
+        if not self.should_block(request.url, request.resource_type):
+            await route.fallback()
+            return
+
+        try:
+            stats = self._page_stats.setdefault(request.frame.page, {'blocked': 0, 'bytes_saved': 0})
+            stats['blocked'] += 1
+            stats['bytes_saved'] += ESTIMATED_BYTES.get(request.resource_type, ESTIMATED_BYTES['other'])
+        except Exception:
+            pass  # Service worker requests have no frame
+        await route.abort()
+
+    def report(self, page, label: str) -> dict:
+        """Print and forget the blocked-request stats for a page"""
+        stats = self._page_stats.pop(page, {'blocked': 0, 'bytes_saved': 0})
+        print(f"Resource policy for {label}: blocked {stats['blocked']} requests, "
+              f"~{stats['bytes_saved'] / 1024 / 1024:.1f} MB saved (estimated)")
+        return stats
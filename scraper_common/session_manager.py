@@ -0,0 +1,207 @@
+# Shared session manager for the X and Instagram scrapers.
+# Every run used to prove its login with a full page load (x.com/home, an
+# Instagram verify page, and the archive script verified twice). Sessions
+# are now validated cheaply and the result is cached:
+#   1. offline: the saved session file must hold unexpired auth cookies
+#   2. within VERIFY_TTL of the last successful check nothing else is done
+#   3. otherwise one API request is made with the context's cookies (no
+#      page render), and only a failed check falls back to the full login
+# Accounts come from a JSON file so several can be rotated; each worker gets
+# the least recently used healthy one; sharded runs pick and verify one in
+# the parent and hand it to every shard by name. Verification times, last
+# use and failures are kept in a small state file shared by cron runs and
+# shards, and a successful open clears an account's failures.
+
+import json
+import os
+import time
+
+VERIFY_TTL = 6 * 60 * 60        # seconds a successful check is trusted
+FAILURE_COOLDOWN = 30 * 60      # seconds a failing account is left alone
+EXPIRY_MARGIN = 60 * 60         # auth cookies must outlive the run by this much
+
+# Platform presets: the cookie that carries the login and the cheap probe
+X_AUTH_COOKIES = ('auth_token', 'ct0')
+INSTAGRAM_AUTH_COOKIES = ('sessionid', 'ds_user_id')
+INSTAGRAM_PROBE_URL = 'https://www.instagram.com/api/v1/accounts/current_user/?edit=true'
+INSTAGRAM_APP_ID = '936619743392459'  # public id sent by the Instagram web app
+
+
+async def probe_instagram(context) -> bool:
+    """One API request with the context's cookies: 200 with a user means logged in"""
+    response = await context.request.get(INSTAGRAM_PROBE_URL, headers={'X-IG-App-ID': INSTAGRAM_APP_ID},
+                                         max_redirects=0, fail_on_status_code=False)
+    if response.status != 200:
+        return False
+    try:
+        return bool((await response.json()).get('user'))
+    except Exception:
+        return False
+
+
+class Account:
+    """Credentials plus the file its browser session is saved to"""
+
+    def __init__(self, username: str, password: str, session_file: str):
+        self.username = username
+        self.password = password
+        self.session_file = session_file
+
+    def __repr__(self):
+        return f"Account({self.username!r})"
+
+
+def load_accounts(accounts_file: str, username: str, password: str, session_file: str) -> list:
+    """Accounts from a JSON list of {username, password, session_file}, else the single default account"""
+    if accounts_file and os.path.exists(accounts_file):
+        with open(accounts_file, 'r') as f:
+            return [Account(entry['username'], entry['password'],
+                            entry.get('session_file') or f"{entry['username']}_{os.path.basename(session_file)}")
+                    for entry in json.load(f)]
+    return [Account(username, password, session_file)]
+
+
+class SessionManager:
+    """Account pool with TTL-cached verification and LRU hand-out"""
+
+    def __init__(self, platform: str, accounts: list, login, session_format: str = 'cookies',
+                 auth_cookies: tuple = (), probe=None, verify_ttl: float = VERIFY_TTL, state_file: str = None):
+        if session_format not in ('cookies', 'storage_state'):
+            raise ValueError(f"Unknown session format {session_format!r}")
+        self.platform = platform
+        self.accounts = accounts
+        self.login = login              # async (browser, account, policy) -> context or None
+        self.session_format = session_format
+        self.auth_cookies = auth_cookies
+        self.probe = probe              # async (context) -> bool, None to trust the login hook's check
+        self.verify_ttl = verify_ttl
+        self.state_file = state_file or f"{platform}_session_state.json"
+
+    # ---------------- persisted state ----------------
+
+    def _load_state(self) -> dict:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_state(self, account: Account, **fields):
+        state = self._load_state()
+        state.setdefault(account.username, {}).update(fields)
+        # Atomic replace so concurrent shards never read a half-written file
+        tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    # ---------------- account hand-out ----------------
+
+    def acquire(self) -> Account:
+        """Least recently used account that is not cooling down after failures"""
+        state = self._load_state()
+        now = time.time()
+        healthy = [account for account in self.accounts
+                   if state.get(account.username, {}).get('cooldown_until', 0) <= now]
+        if not healthy:
+            raise RuntimeError(f"No healthy {self.platform} account available")
+        account = min(healthy, key=lambda a: state.get(a.username, {}).get('last_used', 0))
+        self._update_state(account, last_used=now)
+        return account
+
+    def get(self, username: str) -> Account:
+        """The configured account with this username, e.g. the one a shard was handed by its parent"""
+        for account in self.accounts:
+            if account.username == username:
+                return account
+        raise KeyError(f"No {self.platform} account {username!r} configured")
+
+    def release(self, account: Account, healthy: bool = True):
+        if healthy:
+            self._update_state(account, failures=0, cooldown_until=0)
+            return
+        failures = self._load_state().get(account.username, {}).get('failures', 0) + 1
+        print(f"{self.platform} account {account.username} failed ({failures}), cooling down")
+        self._update_state(account, failures=failures, last_verified=0,
+                           cooldown_until=time.time() + FAILURE_COOLDOWN * failures)
+
+    # ---------------- validation ----------------
+
+    def _saved_cookies(self, account: Account) -> list:
+        if not os.path.exists(account.session_file):
+            return []
+        try:
+            with open(account.session_file, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return saved.get('cookies', []) if self.session_format == 'storage_state' else saved
+
+    def cookies_valid(self, account: Account) -> bool:
+        """Offline check: every auth cookie is saved and not about to expire"""
+        cookies = {cookie['name']: cookie for cookie in self._saved_cookies(account)}
+        if not cookies:
+            return False
+        deadline = time.time() + EXPIRY_MARGIN
+        for name in self.auth_cookies:
+            cookie = cookies.get(name)
+            # expires -1 is a session cookie, kept for as long as the saved file
+            if not cookie or (cookie.get('expires', -1) != -1 and cookie['expires'] < deadline):
+                return False
+        return True
+
+    def recently_verified(self, account: Account) -> bool:
+        last_verified = self._load_state().get(account.username, {}).get('last_verified', 0)
+        return time.time() - last_verified < self.verify_ttl
+
+    async def new_context(self, browser, account: Account, policy=None, **context_options):
+        """Browser context carrying the account's saved session"""
+        if self.session_format == 'storage_state' and os.path.exists(account.session_file):
+            context_options['storage_state'] = account.session_file
+        context = await browser.new_context(**context_options)
+        if self.session_format == 'cookies':
+            cookies = self._saved_cookies(account)
+            if cookies:
+                await context.add_cookies(cookies)
+        if policy:
+            await policy.apply(context)
+        return context
+
+    async def open(self, browser, account: Account, policy=None, **context_options):
+        """Logged-in context for account, verifying as cheaply as the cached state allows"""
+        started = time.monotonic()
+        if self.cookies_valid(account):
+            context = await self.new_context(browser, account, policy, **context_options)
+            if self.recently_verified(account):
+                print(f"{self.platform} session for {account.username} verified within TTL, no check needed")
+                self.release(account, healthy=True)
+                return context
+            if self.probe:
+                try:
+                    valid = await self.probe(context)
+                except Exception as e:
+                    print(f"{self.platform} session probe failed: {e}")
+                    valid = False
+                if valid:
+                    self._update_state(account, last_verified=time.time())
+                    self.release(account, healthy=True)
+                    print(f"{self.platform} session for {account.username} probed in "
+                          f"{time.monotonic() - started:.2f}s")
+                    return context
+            await context.close()
+
+        # Missing, expired or rejected session (or no probe): full login check
+        try:
+            context = await self.login(browser, account, policy)
+        except Exception:
+            self.release(account, healthy=False)
+            raise
+        if context:
+            self._update_state(account, last_verified=time.time())
+            self.release(account, healthy=True)
+            print(f"{self.platform} login for {account.username} took {time.monotonic() - started:.1f}s")
+        else:
+            self.release(account, healthy=False)
+        return context
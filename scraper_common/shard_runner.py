@@ -0,0 +1,80 @@
+# Multi-process sharded runner.
+# Splits a target list across K worker processes, each with its own event
+# loop and browser, and collects the per-worker stats in the parent. K is
+# chosen from the available cores and memory unless given explicitly. The
+# workers share one account, so each paces itself at 1/K of the rate limits.
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scraper_common.rate_limiter import share_budget
+
+# Chromium with a few tabs plus the Python worker, in bytes
+MEMORY_PER_WORKER = 700 * 1024 * 1024
+
+
+def available_memory() -> int:
+    """Bytes of memory available to new processes, 0 if unknown"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def choose_shard_count(num_targets: int, memory_per_worker: int = MEMORY_PER_WORKER) -> int:
+    """One worker per core, capped by memory and by the number of targets"""
+    shards = available_cores()
+    memory = available_memory()
+    if memory:
+        shards = min(shards, max(memory // memory_per_worker, 1))
+    return max(min(shards, num_targets), 1)
+
+
+def split_targets(targets: list, shards: int) -> list:
+    """Round-robin split so every shard gets a similar mix of targets"""
+    return [targets[i::shards] for i in range(shards) if targets[i::shards]]
+
+
+def run_sharded(worker, targets: list, shards: int = None) -> list:
+    """Run worker(shard_targets) in separate processes and return their results.
+
+    worker must be a module-level function returning a picklable stats dict.
+    """
+    shards = shards or choose_shard_count(len(targets))
+    parts = split_targets(targets, shards)
+    print(f"Running {len(targets)} targets in {len(parts)} worker processes")
+
+    results = []
+    started = time.monotonic()
+    # spawn: every worker gets a fresh interpreter, event loop and Mongo client
+    with ProcessPoolExecutor(max_workers=len(parts), mp_context=multiprocessing.get_context('spawn'),
+                             initializer=share_budget, initargs=(len(parts),)) as pool:
+        futures = {pool.submit(worker, part): index for index, part in enumerate(parts)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                stats = {'error': str(e)}
+            stats = dict(stats or {}, shard=index, targets=parts[index])
+            # Metric snapshots are merged by the caller, too long to print
+            print(f"Shard {index} finished: { {key: value for key, value in stats.items() if key != 'metrics'} }")
+            results.append(stats)
+
+    print(f"All {len(parts)} shards finished in {time.monotonic() - started:.1f}s")
+    return sorted(results, key=lambda r: r['shard'])
@@ -0,0 +1,94 @@
+# Index provisioning and per-target "latest post" watermarks.
+# The incremental-stop check used to sort the whole post collection on an
+# unindexed string field. Each target now has a small watermark document
+# that is advanced after every bulk write, so looking up the
+# latest post is a single _id point read. Targets scraped before watermarks
+# existed are seeded once from their stored posts, comparing parsed dates:
+# the stored strings are not uniform enough to sort as text.
+
+import datetime
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+WATERMARK_COLLECTION = 'scrape_watermarks'
+
+# (database, collection) pairs already provisioned by this process
+_indexed = set()
+
+
+def ensure_indexes(collection, key: str = 'post_id'):
+    """Create the unique key index and the datetime index once per process"""
+    marker = (collection.database.name, collection.name)
+    if marker in _indexed:
+        return
+    try:
+        # Partial so documents scraped without an id don't collide on null
+        collection.create_index([(key, ASCENDING)], unique=True, name=f'{key}_unique',
+                                partialFilterExpression={key: {'$type': 'string'}})
+    except OperationFailure as e:
+        print(f"Could not create unique {key} index on {collection.name}: {e}")
+    collection.create_index([('datetime', DESCENDING)], name='datetime_desc')
+    _indexed.add(marker)
+
+
+def parse_datetime(value):
+    """ISO string from the page or API -> aware datetime, None if missing or malformed"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    # Dates stored without an offset are UTC; aware either way so they compare with each other
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+class Watermark:
+    """Latest scraped post for one target, stored as one document keyed by target"""
+
+    def __init__(self, collection, key: str = 'post_id'):
+        self.collection = collection
+        self.key = key
+        self.target = collection.name
+        self.watermarks = collection.database[WATERMARK_COLLECTION]
+
+    def latest(self):
+        """Return the latest scraped post id, or None for a new target"""
+        doc = self.watermarks.find_one({'_id': self.target}, {'latest': 1})
+        if doc and doc.get('latest'):
+            return doc['latest'][self.key]
+
+        # Targets scraped before watermarks existed: one scan of key and date, parsed rather
+        # than string-sorted ('...Z' and '+00:00' offsets, with or without milliseconds)
+        newest = self._newest(self.collection.find({'datetime': {'$type': 'string'}},
+                                                   {self.key: 1, 'datetime': 1}))
+        if newest:
+            self._store(*newest)
+            return newest[1]
+        return None
+
+    def _newest(self, docs):
+        """(posted_at, key) of the newest doc with a key and a parseable date, None if there is none"""
+        candidates = [(parse_datetime(doc.get('datetime')), doc[self.key]) for doc in docs
+                      if doc.get(self.key) and parse_datetime(doc.get('datetime'))]
+        return max(candidates) if candidates else None
+
+    def advance(self, docs):
+        """Move the watermark forward to the newest of docs, never backwards"""
+        newest = self._newest(docs)
+        if newest:
+            self._store(*newest)
+
+    def _store(self, posted_at, key_value):
+        # Single conditional upsert: only matches while the stored watermark is
+        # older, so concurrent writers can never move it backwards
+        try:
+            self.watermarks.update_one(
+                {'_id': self.target, '$or': [{'latest.posted_at': {'$lt': posted_at}},
+                                             {'latest': {'$exists': False}}]},
+                {'$set': {'latest': {'posted_at': posted_at, self.key: key_value},
+                          'updated_at': datetime.datetime.now(datetime.timezone.utc)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # The stored watermark is already newer